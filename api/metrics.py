@@ -0,0 +1,115 @@
+# api/metrics.py
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from starlette.datastructures import MutableHeaders
+
+from services.metrics import observe_stages, render_metrics
+from services.profiler import profiler
+from services.render_cache import render_cache
+from services.render_executor import render_executor
+from timing import StageTimer, reset_timer, set_timer
+
+router = APIRouter(tags=["metrics"])
+
+LOCAL_CLIENTS = ("127.0.0.1", "::1")
+
+
+class StageTimingMiddleware:
+    """Give every request a StageTimer and report what the routes timed.
+
+    Time until the endpoint runs is the ``validate`` stage (receiving and
+    parsing the body, Pydantic validation); routes add their own stages.
+    Stages known when the response starts go into a ``Server-Timing``
+    header. Sending the body is the ``response`` stage, and the whole
+    request is ``total``. Both are recorded in the metrics together with
+    the other stages once the response is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timer = StageTimer(f"{scope['method']} {scope['path']}")
+        token = set_timer(timer)
+        response_started = None
+
+        async def send_with_timing(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = time.perf_counter()
+                if timer.stages:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            reset_timer(token)
+            if timer.labels is not None:
+                if response_started is not None:
+                    timer.add("response", time.perf_counter() - response_started)
+                timer.add("total", timer.elapsed())
+                observe_stages(timer)
+
+
+def _require_local(request: Request):
+    if request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="Only served to local clients")
+
+
+def _require_profiler():
+    if not profiler.enabled:
+        raise HTTPException(status_code=404,
+                            detail="Profiling is disabled; set PROFILE_SAMPLE_RATE to enable it")
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Prometheus scrape endpoint, served to local clients only"""
+    _require_local(request)
+    queue = render_executor.stats()
+    cache = render_cache.stats()
+    body = render_metrics([
+        ("render_queue_pending", "gauge",
+         "Renders running or waiting on the render executor.", queue["pending"]),
+        ("render_queue_rejected_total", "counter",
+         "Renders rejected because the queue was full.", queue["rejected"]),
+        ("render_lane_running", "gauge", "Renders running, by priority lane.",
+         [({"lane": name}, lane["running"]) for name, lane in queue["lanes"].items()]),
+        ("render_lane_queued", "gauge", "Renders waiting for a worker, by priority lane.",
+         [({"lane": name}, lane["queued"]) for name, lane in queue["lanes"].items()]),
+        ("render_lane_rejected_total", "counter",
+         "Renders rejected because their lane's queue was full, by priority lane.",
+         [({"lane": name}, lane["rejected"]) for name, lane in queue["lanes"].items()]),
+        ("render_cache_hits_total", "counter", "Render cache hits.", cache["hits"]),
+        ("render_cache_misses_total", "counter", "Render cache misses.", cache["misses"]),
+        ("render_cache_bytes", "gauge",
+         "Bytes held in the in-memory render cache.", cache["bytes"]),
+    ])
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/admin/profile", include_in_schema=False)
+def profile(request: Request, endpoint: Optional[str] = None, stats: bool = False):
+    """Sampled render stacks in the collapsed format, served to local clients only"""
+    _require_local(request)
+    _require_profiler()
+    if stats:
+        return profiler.stats()
+    return Response(profiler.collapsed(endpoint), media_type="text/plain; charset=utf-8")
+
+
+@router.delete("/admin/profile", include_in_schema=False)
+def clear_profile(request: Request):
+    """Drop the samples collected so far"""
+    _require_local(request)
+    _require_profiler()
+    profiler.clear()
+    return {"status": "cleared"}
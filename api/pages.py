@@ -0,0 +1,106 @@
+# api/pages.py
+import datetime
+import gzip
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The form page changes daily (its default dates), so clients may keep it
+# but must revalidate; an unchanged page then costs a 304
+PAGE_CACHE_CONTROL = os.environ.get("PAGE_CACHE_CONTROL", "public, no-cache")
+# Seconds browsers and proxies may reuse files under /static without asking
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 7 * 24 * 3600))
+STATIC_CACHE_CONTROL = f"public, max-age={STATIC_MAX_AGE}"
+
+# Preferred first
+PAGE_ENCODINGS = ("br", "gzip")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    def bare(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    return any(bare(tag) == bare(etag) for tag in if_none_match.split(","))
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class CompiledPage:
+    """An HTML page encoded once, with its ETag and compressed variants.
+
+    The variants share one weak ETag: they are the same representation
+    under different content codings.
+    """
+
+    def __init__(self, html: str):
+        body = html.encode("utf-8")
+        self.etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.variants = {"identity": body, "gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def select(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        """Return (content coding or None, body) for an Accept-Encoding header"""
+        accepted = _accepted_encodings(accept_encoding)
+        for coding in PAGE_ENCODINGS:
+            if coding in self.variants and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+                return coding, self.variants[coding]
+        return None, self.variants["identity"]
+
+
+class DailyPage:
+    """A page that depends only on the date, compiled on the first request of each day."""
+
+    def __init__(self, build: Callable[[datetime.date], str]):
+        self._build = build
+        self._lock = threading.Lock()
+        self._page = None    # (date, CompiledPage)
+        self.builds = 0
+
+    def get(self) -> CompiledPage:
+        today = datetime.date.today()
+        page = self._page
+        if page is None or page[0] != today:
+            with self._lock:
+                page = self._page
+                if page is None or page[0] != today:
+                    page = self._page = (today, CompiledPage(self._build(today)))
+                    self.builds += 1
+        return page[1]
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles whose responses, 304s included, carry a long-lived Cache-Control"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+        return response
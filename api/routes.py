@@ -1,38 +1,308 @@
 # api/routes.py
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-import io
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
 import datetime
 
-from models import InvoiceRequest
-from services.invoice_service import process_invoice_data, generate_invoice_bytes
+from api.pages import etag_matches
+from fonts import registry as font_registry
+from models import InvoiceRequest, ReceiptRequest, loads
+from services.batch_service import parse_batch_body, stream_batch_zip, stream_batch_ndjson, BATCH_MAX_ITEMS
+from services.job_queue import job_queue, job_status
+from services.invoice_service import (process_invoice_data, generate_invoice_bytes,
+                                      generate_invoice_with_layout, layout_body,
+                                      output_file_info, should_stream_pdf, iter_invoice_pdf)
+from services.receipt_service import (process_receipt_data, generate_receipt_bytes,
+                                      generate_receipt_with_layout)
+from services.metrics import count_error, count_output, document_labels
+from services.readiness import readiness
+from services.render_cache import render_cache, cache_key
+from services.render_executor import render_executor, RenderQueueFull, RENDER_RETRY_AFTER
+from timing import current_timer, stage
 
-router = APIRouter(prefix="/api", tags=["api"])
+
+class _JSONRequest(Request):
+    """A Request whose JSON body is decoded with models.loads"""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class JSONRoute(APIRoute):
+    """APIRoute decoding JSON body parameters with models.loads (orjson when installed).
+
+    FastAPI keeps its content-type rules and 400/422 errors; only the
+    JSON parser changes.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await handler(_JSONRequest(request.scope, request.receive))
+        return route_handler
+
+
+router = APIRouter(prefix="/api", tags=["api"], route_class=JSONRoute)
 
 
 @router.get("/health")
-def health_check():
+async def health_check():
     """Public health check endpoint"""
-    return {"status": "ok", "service": "invoice-generator"}
+    return {
+        "status": "ok",
+        "service": "invoice-generator",
+        "font_cache": font_registry.stats(),
+        "render_queue": render_executor.stats(),
+        "render_cache": render_cache.stats(),
+        "startup": readiness.stats(),
+        "jobs": await job_queue.stats(),
+    }
 
 
-@router.post("/generate")
-def generate_invoice_api(invoice_data: InvoiceRequest):
-    """
-    API endpoint to generate invoices from external clients.
-    Open to all clients without authentication.
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has finished"""
+    if not readiness.ready:
+        return JSONResponse(status_code=503,
+                            content={"status": "starting", "startup": readiness.stats()})
+    return {"status": "ready", "startup": readiness.stats()}
+
+
+def _label_request(kind: str, format: str, processed_data: dict):
+    """Record this request's stages under the document's metric labels"""
+    timer = current_timer()
+    if timer is not None:
+        timer.labels = document_labels(kind, format, processed_data)
+
+
+def _mark_validated():
+    """Close the validate stage: everything before the endpoint started"""
+    timer = current_timer()
+    if timer is not None:
+        timer.mark("validate")
+
+
+async def _cached_render_response(kind: str, number: str, processed_data: dict,
+                                  format: str, profile: str, generate, if_none_match: str,
+                                  generate_layout=None):
+    """Serve a processed document from the render cache or render it on the pool.
+
+    With ``generate_layout`` the response is JSON holding the base64 image
+    and the box of every drawn field, cached separately from the image.
     """
+    _label_request(kind, format, processed_data)
     try:
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        processed_data = process_invoice_data(invoice_data)
-        invoice_bytes = generate_invoice_bytes(processed_data, invoice_data.format)
+        key = cache_key(processed_data, format, profile,
+                        "layout" if generate_layout is not None else "")
+        etag = f'W/"{key}"'
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        if generate_layout is not None:
+            with stage("cache"):
+                body = render_cache.get(key)
+            if body is None:
+                data, layout = await render_executor.run_timed(generate_layout, processed_data,
+                                                               format, profile)
+                body = layout_body(data, layout, format)
+                render_cache.put(key, body)
+            count_output(kind, format, len(body))
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
         
-        ext = "pdf" if invoice_data.format == "pdf" else "png"
-        media_type = "application/pdf" if invoice_data.format == "pdf" else "image/png"
-        filename = f"invoice_{invoice_data.invoice_no}_{timestamp}.{ext}"
-        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+        with stage("cache"):
+            document_bytes = render_cache.get(key)
+        if document_bytes is None:
+            document_bytes = await render_executor.run_timed(generate, processed_data, format,
+                                                             profile)
+            render_cache.put(key, document_bytes)
+        count_output(kind, format, len(document_bytes))
         
-        return StreamingResponse(io.BytesIO(invoice_bytes), media_type=media_type, headers=headers)
+        ext, media_type = output_file_info(format)
+        filename = f"{kind}_{number}_{timestamp}.{ext}"
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"', "ETag": etag}
+        
+        # The document is already in memory: send it in one piece with a Content-Length
+        return Response(document_bytes, media_type=media_type, headers=headers)
             
+    except RenderQueueFull as e:
+        count_error(kind, format, "queue_full")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RENDER_RETRY_AFTER)})
+    except Exception as e:
+        count_error(kind, format)
+        raise HTTPException(status_code=500, detail=f"Error generating {kind}: {str(e)}")
+
+
+async def _streamed_pdf_response(kind: str, number: str, processed_data: dict, generate_chunks,
+                                 if_none_match: str):
+    """Stream a large PDF to the client page by page as it is generated.
+
+    Not cached: holding the whole document is what streaming avoids. The
+    first page is rendered before the response starts, so a full queue or
+    a render error still gets a proper status code.
+    """
+    _label_request(kind, "pdf", processed_data)
+    stream = None
+    try:
+        key = cache_key(processed_data, "pdf", "", "stream")
+        etag = f'W/"{key}"'
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        stream = render_executor.iterate(generate_chunks(processed_data))
+        first = await stream.__anext__()
+    except RenderQueueFull as e:
+        await stream.aclose()
+        count_error(kind, "pdf", "queue_full")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RENDER_RETRY_AFTER)})
+    except Exception as e:
+        if stream is not None:
+            await stream.aclose()
+        count_error(kind, "pdf")
+        raise HTTPException(status_code=500, detail=f"Error generating {kind}: {str(e)}")
+    
+    async def body():
+        sent = 0
+        try:
+            yield first
+            sent += len(first)
+            async for chunk in stream:
+                yield chunk
+                sent += len(chunk)
+        finally:
+            await stream.aclose()
+            count_output(kind, "pdf", sent)
+    
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    headers = {"Content-Disposition": f'attachment; filename="{kind}_{number}_{timestamp}.pdf"',
+               "ETag": etag}
+    return StreamingResponse(body(), media_type="application/pdf", headers=headers)
+
+
+async def _batch_response(request: Request, kind: str):
+    """Parse a batch body and stream it back as a ZIP, or NDJSON if accepted"""
+    body = await request.body()
+    try:
+        items = parse_batch_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {str(e)}")
+    if not items:
+        raise HTTPException(status_code=400, detail=f"Batch contains no {kind}s")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch exceeds {BATCH_MAX_ITEMS} {kind}s")
+    
+    if "ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(stream_batch_ndjson(items, kind=kind),
+                                 media_type="application/x-ndjson")
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    headers = {"Content-Disposition": f'attachment; filename="{kind}s_{timestamp}.zip"'}
+    return StreamingResponse(stream_batch_zip(items, kind=kind), media_type="application/zip",
+                             headers=headers)
+
+
+@router.post("/generate")
+async def generate_invoice_api(invoice_data: InvoiceRequest, if_none_match: str = Header(default="")):
+    """
+    API endpoint to generate invoices from external clients.
+    Open to all clients without authentication.
+    Identical requests are served from the render cache; the ETag is the
+    content hash of the request, so clients can revalidate for a 304.
+    PDFs with many line items are streamed page by page instead.
+    """
+    _mark_validated()
+    try:
+        with stage("process"):
+            processed_data = process_invoice_data(invoice_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating invoice: {str(e)}")
+    if should_stream_pdf(processed_data, invoice_data.format):
+        return await _streamed_pdf_response("invoice", invoice_data.invoice_no, processed_data,
+                                            iter_invoice_pdf, if_none_match)
+    return await _cached_render_response(
+        "invoice", invoice_data.invoice_no, processed_data, invoice_data.format,
+        invoice_data.encoder_profile, generate_invoice_bytes, if_none_match,
+        generate_invoice_with_layout if invoice_data.include_layout else None,
+    )
+
+
+@router.post("/generate/batch")
+async def generate_invoice_batch(request: Request):
+    """
+    Generate many invoices in one request.
+    Accepts a JSON array or NDJSON body of invoices (same fields as
+    /api/generate) and streams back a ZIP archive as renders finish.
+    Per-item failures are reported in manifest.json inside the archive.
+    With "Accept: application/x-ndjson" the response is NDJSON instead.
+    """
+    return await _batch_response(request, "invoice")
+
+
+@router.post("/receipt")
+async def generate_receipt_api(receipt_data: ReceiptRequest, if_none_match: str = Header(default="")):
+    """
+    Generate a single-line PAID receipt.
+    Shares the render cache, ETag revalidation and render pool with
+    /api/generate.
+    """
+    _mark_validated()
+    with stage("process"):
+        processed_data = process_receipt_data(receipt_data)
+    return await _cached_render_response(
+        "receipt", receipt_data.receipt_no, processed_data, receipt_data.format,
+        receipt_data.encoder_profile, generate_receipt_bytes, if_none_match,
+        generate_receipt_with_layout if receipt_data.include_layout else None,
+    )
+
+
+@router.post("/receipt/batch")
+async def generate_receipt_batch(request: Request):
+    """
+    Generate many receipts in one request, as a ZIP archive or NDJSON.
+    Takes the same body and Accept options as /api/generate/batch.
+    """
+    return await _batch_response(request, "receipt")
+
+
+@router.post("/jobs", status_code=202)
+async def create_invoice_job(invoice_data: InvoiceRequest):
+    """
+    Queue an invoice render and return at once with the job's status.
+    Takes the same body as /api/generate. Poll /api/jobs/{id} until the
+    job is done, then fetch the document from /api/jobs/{id}/result.
+    """
+    job = await job_queue.submit("invoice", invoice_data.model_dump(by_alias=True))
+    return JSONResponse(status_code=202, content=job_status(job),
+                        headers={"Location": f"/api/jobs/{job['id']}"})
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a render job: queued, running, done or failed"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_status(job)
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """The rendered document of a finished job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}",
+                            headers={"Retry-After": str(RENDER_RETRY_AFTER)})
+    data = await job_queue.result(job_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    headers = {"Content-Disposition": f'attachment; filename="{job["filename"]}"'}
+    return Response(data, media_type=job["media_type"], headers=headers)
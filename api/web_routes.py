@@ -1,22 +1,40 @@
 # api/web_routes.py
-from fastapi import APIRouter, Form
-from fastapi.responses import HTMLResponse, StreamingResponse
-import io
+from fastapi import APIRouter, Form, Header, HTTPException
+from fastapi.responses import HTMLResponse, Response
 import datetime
 
+from api.pages import DailyPage, PAGE_CACHE_CONTROL, etag_matches
+from encoders import DEFAULT_PROFILE
 from form_template import get_invoice_form_html
-from services.invoice_service import process_invoice_data, generate_invoice_bytes
+from models import output_format
+from services.invoice_service import process_invoice_data, generate_invoice_bytes, output_file_info
+from services.metrics import count_error, count_output, document_labels
+from services.render_cache import render_cache, cache_key
+from services.render_executor import render_executor, RenderQueueFull, RENDER_RETRY_AFTER
+from timing import current_timer, stage
 
 router = APIRouter(tags=["web"])
 
 
+# Only the default dates change, so the page is built and compressed once a day
+form_page = DailyPage(get_invoice_form_html)
+
+
+@router.head("/", include_in_schema=False)
 @router.get("/", response_class=HTMLResponse)
-def form():
-    return get_invoice_form_html()
+async def form(accept_encoding: str = Header(default=""), if_none_match: str = Header(default="")):
+    page = form_page.get()
+    headers = {"ETag": page.etag, "Cache-Control": PAGE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if if_none_match and etag_matches(if_none_match, page.etag):
+        return Response(status_code=304, headers=headers)
+    encoding, body = page.select(accept_encoding)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return HTMLResponse(content=body, headers=headers)
 
 
 @router.post("/generate")
-def generate(
+async def generate(
     # Invoice details
     invoice_no: str = Form(...),
     invoice_date: str = Form(...),
@@ -47,7 +65,11 @@ def generate(
     mark_paid: str = Form(""),
     format: str = Form("pdf"),
 ):
+    timer = current_timer()
+    if timer is not None:
+        timer.mark("validate")
     timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    format = output_format(format)
     
     form_data = {
         "invoice_no": invoice_no,
@@ -74,12 +96,26 @@ def generate(
         "mark_paid": mark_paid
     }
     
-    processed_data = process_invoice_data(form_data, is_form_data=True)
-    invoice_bytes = generate_invoice_bytes(processed_data, format)
+    with stage("process"):
+        processed_data = process_invoice_data(form_data)
+    if timer is not None:
+        timer.labels = document_labels("invoice", format, processed_data)
+    key = cache_key(processed_data, format, DEFAULT_PROFILE)
+    with stage("cache"):
+        invoice_bytes = render_cache.get(key)
+    if invoice_bytes is None:
+        try:
+            invoice_bytes = await render_executor.run_timed(generate_invoice_bytes, processed_data,
+                                                            format, lane="interactive")
+        except RenderQueueFull as e:
+            count_error("invoice", format, "queue_full")
+            raise HTTPException(status_code=503, detail=str(e),
+                                headers={"Retry-After": str(RENDER_RETRY_AFTER)})
+        render_cache.put(key, invoice_bytes)
+    count_output("invoice", format, len(invoice_bytes))
     
-    ext = "pdf" if format == "pdf" else "png"
-    media_type = "application/pdf" if format == "pdf" else "image/png"
+    ext, media_type = output_file_info(format)
     filename = f"invoice_{invoice_no}_{timestamp}.{ext}"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
     
-    return StreamingResponse(io.BytesIO(invoice_bytes), media_type=media_type, headers=headers)
+    return Response(invoice_bytes, media_type=media_type, headers=headers)
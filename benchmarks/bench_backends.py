@@ -0,0 +1,49 @@
+# benchmarks/bench_backends.py
+"""Compare render throughput in-process vs thread and process pools.
+
+Usage: python -m benchmarks.bench_backends [renders] [pool sizes...]
+"""
+import os
+import sys
+import time
+from concurrent.futures import wait
+
+from benchmarks.payloads import sample_processed
+from services.invoice_service import generate_invoice_bytes
+from services.render_executor import RenderExecutor
+
+
+def _in_process(data, fmt, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        generate_invoice_bytes(data, fmt)
+    return renders / (time.perf_counter() - start)
+
+
+def _pooled(kind, workers, data, fmt, renders):
+    executor = RenderExecutor(kind, workers, renders)
+    executor.start()
+    try:
+        start = time.perf_counter()
+        wait([executor.submit(generate_invoice_bytes, data, fmt) for _ in range(renders)])
+        return renders / (time.perf_counter() - start)
+    finally:
+        executor.shutdown()
+
+
+def run(renders: int = 200, pool_sizes=None):
+    pool_sizes = pool_sizes or sorted({1, 2, 4, os.cpu_count() or 1})
+    data = sample_processed()
+    print(f"{'format':<6} {'backend':<10} {'workers':>7} {'req/s':>9}")
+    for fmt in ("pdf", "png"):
+        generate_invoice_bytes(data, fmt)
+        print(f"{fmt:<6} {'inline':<10} {1:>7} {_in_process(data, fmt, renders):>9.1f}")
+        for kind in ("thread", "process"):
+            for workers in pool_sizes:
+                rps = _pooled(kind, workers, data, fmt, renders)
+                print(f"{fmt:<6} {kind:<10} {workers:>7} {rps:>9.1f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(args[0] if args else 200, args[1:] or None)
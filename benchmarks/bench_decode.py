@@ -0,0 +1,97 @@
+# benchmarks/bench_decode.py
+"""Per-request cost of decoding and validating an /api/generate body.
+
+Usage: python -m benchmarks.bench_decode [--number N]
+
+"decode+validate" times the body-to-InvoiceRequest step alone: the
+json module plus model validation (what FastAPI does for a body
+parameter), models.loads plus model validation (what JSONRoute does), and
+pydantic's own JSON parser for reference. "route" times whole requests
+through a minimal app, in-process over ASGI, with the body declared as
+a FastAPI parameter on a plain route and on api.routes.JSONRoute. Bodies have 1, 20
+and 500 line items.
+"""
+import argparse
+import asyncio
+import json
+import time
+import timeit
+
+from benchmarks.payloads import invoice_request
+from models import InvoiceRequest, loads, orjson
+
+ROWS = (1, 20, 500)
+
+
+def _body(rows: int) -> bytes:
+    body = invoice_request("long", "paid", "pdf")
+    if rows > 1:
+        body["lineItems"] = [{"description": f"Line {i}", "quantity": i % 9 + 1,
+                              "unitPrice": f"{i % 500 + 0.99:.2f}"} for i in range(rows)]
+    return json.dumps(body).encode("utf-8")
+
+
+def _per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def decode_validate(number: int):
+    print(f"decode+validate, us per body ({'orjson' if orjson else 'no orjson'} installed)")
+    print(f"{'rows':>5} {'json+validate':>14} {'loads+validate':>15} {'validate_json':>14} {'speedup':>8}")
+    for rows in ROWS:
+        body = _body(rows)
+        n = max(1, number // rows)
+        generic = _per_call_us(lambda: InvoiceRequest.model_validate(json.loads(body)), n)
+        fast = _per_call_us(lambda: InvoiceRequest.model_validate(loads(body)), n)
+        native = _per_call_us(lambda: InvoiceRequest.model_validate_json(body), n)
+        print(f"{rows:>5} {generic:>14.1f} {fast:>15.1f} {native:>14.1f} {generic / fast:>7.2f}x")
+
+
+def routes(number: int):
+    import httpx
+    from fastapi import APIRouter, FastAPI
+    from api.routes import JSONRoute
+
+    app = FastAPI()
+    fast_router = APIRouter(route_class=JSONRoute)
+
+    @app.post("/generic")
+    async def generic(invoice_data: InvoiceRequest):
+        return {"invoiceNo": invoice_data.invoice_no}
+
+    @fast_router.post("/fast")
+    async def fast(invoice_data: InvoiceRequest):
+        return {"invoiceNo": invoice_data.invoice_no}
+
+    app.include_router(fast_router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print("\nroute, us per request (including the in-process client)")
+            print(f"{'rows':>5} {'body param':>11} {'JSONRoute':>13} {'saved':>7}")
+            headers = {"content-type": "application/json"}
+            for rows in ROWS:
+                body = _body(rows)
+                n = max(20, number // 10 // rows)
+                best = {}
+                for _ in range(3):
+                    for path in ("/generic", "/fast"):
+                        start = time.perf_counter()
+                        for _ in range(n):
+                            response = await client.post(path, content=body, headers=headers)
+                            response.raise_for_status()
+                        took = (time.perf_counter() - start) / n * 1e6
+                        best[path] = min(best.get(path, took), took)
+                print(f"{rows:>5} {best['/generic']:>11.0f} {best['/fast']:>13.0f} "
+                      f"{best['/generic'] - best['/fast']:>7.0f}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=5000, help="calls per timing for 1-row bodies")
+    args = parser.parse_args()
+    decode_validate(args.number)
+    routes(args.number)
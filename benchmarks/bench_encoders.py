@@ -0,0 +1,28 @@
+# benchmarks/bench_encoders.py
+"""Compare output size and encode time per encoder profile and format.
+
+Usage: python -m benchmarks.bench_encoders [iterations]
+"""
+import sys
+import time
+
+from benchmarks.payloads import sample_processed
+from encoders import ENCODER_PROFILES, IMAGE_FORMATS
+from imagegen import draw_invoice_png_bytes
+
+
+def run(iterations: int = 20):
+    data = sample_processed()
+    print(f"{'format':<6} {'profile':<9} {'bytes':>9} {'ms/render':>10}")
+    for image_format in IMAGE_FORMATS:
+        for profile in ENCODER_PROFILES:
+            out = draw_invoice_png_bytes(data, profile=profile, image_format=image_format)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                draw_invoice_png_bytes(data, profile=profile, image_format=image_format)
+            ms = (time.perf_counter() - start) * 1000 / iterations
+            print(f"{image_format:<6} {profile:<9} {len(out):>9} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,78 @@
+# benchmarks/bench_form.py
+"""Cost of serving the HTML form page at GET /.
+
+Usage: python -m benchmarks.bench_form [--requests N]
+
+Times whole requests in-process over ASGI. "rebuilt" is a route that
+renders the page template on every request, as GET / used to. The other
+rows go through api.web_routes: a browser's first load (gzip), a client
+without compression, and a revalidation with If-None-Match, i.e. a
+returning browser or crawler, which gets a 304. Bytes are those sent in
+the response body. Most of each request is the in-process client, so
+the page work alone is timed too: building the template, and looking up
+the compiled page and its variant.
+"""
+import argparse
+import asyncio
+import time
+import timeit
+
+
+async def _time(client, path: str, headers: dict, requests: int):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path, headers=headers)
+        took = (time.perf_counter() - start) / requests * 1e6
+        best = took if best is None else min(best, took)
+    return best, response
+
+
+def run(requests: int = 2000):
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.responses import HTMLResponse
+    from api.web_routes import router
+    from form_template import get_invoice_form_html
+
+    app = FastAPI()
+
+    @app.get("/rebuilt", response_class=HTMLResponse)
+    def rebuilt():
+        return get_invoice_form_html()
+
+    app.include_router(router)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            etag = (await client.get("/")).headers["etag"]
+            cases = (
+                ("rebuilt", "/rebuilt", {"accept-encoding": "gzip"}),
+                ("gzip", "/", {"accept-encoding": "gzip"}),
+                ("identity", "/", {"accept-encoding": "identity"}),
+                ("304", "/", {"accept-encoding": "gzip", "if-none-match": etag}),
+            )
+            print(f"{'GET /':<10} {'status':>6} {'encoding':>9} {'bytes':>7} {'us/request':>11}")
+            for name, path, headers in cases:
+                took, response = await _time(client, path, headers, requests)
+                # httpx decodes the body; count what was on the wire
+                size = int(response.headers.get("content-length", 0))
+                print(f"{name:<10} {response.status_code:>6} "
+                      f"{response.headers.get('content-encoding', '-'):>9} {size:>7} {took:>11.1f}")
+
+    asyncio.run(main())
+
+    from api.web_routes import form_page
+    build = min(timeit.repeat(get_invoice_form_html, number=requests, repeat=3)) / requests * 1e6
+    lookup = min(timeit.repeat(lambda: form_page.get().select("gzip, deflate, br"),
+                               number=requests, repeat=3)) / requests * 1e6
+    print(f"\npage work, us: template build {build:.1f}, compiled lookup {lookup:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.requests)
@@ -0,0 +1,107 @@
+# benchmarks/bench_lanes.py
+"""Form latency with and without bulk API traffic competing for the renderers.
+
+Usage: python -m benchmarks.bench_lanes [--samples N] [--api-clients N] [--batch N]
+                                        [--max-slowdown X]
+
+Times PNG renders through the HTML form handler (the interactive lane),
+first on an idle server, then while API clients post to /api/generate
+back to back (the api lane) and a batch renders (the bulk lane). Every
+render is unique, so none is served from the render cache. Exits non-zero
+if the loaded p50 exceeds the idle p50 plus --max-slowdown renders
+(default 1.5): one render already running when a form arrives is the
+expected wait.
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+
+from benchmarks.payloads import invoice_form, invoice_request
+
+_numbers = itertools.count(1)
+
+
+async def _form_latencies(client, samples: int) -> list:
+    times = []
+    for _ in range(samples):
+        form = dict(invoice_form("short", "unpaid"), invoice_no=f"FORM-{next(_numbers)}",
+                    format="png")
+        start = time.perf_counter()
+        response = await client.post("/generate", data=form)
+        response.raise_for_status()
+        times.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)    # a person, not a script
+    return sorted(times)
+
+
+async def _api_client(client, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        body = dict(invoice_request("short", "unpaid", "png"), invoiceNo=f"API-{next(_numbers)}")
+        response = await client.post("/api/generate", json=body)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(0.05)
+
+
+async def _batch(client, items: int):
+    body = [dict(invoice_request("short", "unpaid", "png"), invoiceNo=f"BULK-{i}")
+            for i in range(items)]
+    response = await client.post("/api/generate/batch", json=body)
+    response.raise_for_status()
+
+
+def _p(times, pct):
+    return times[min(len(times) - 1, int(len(times) * pct))] * 1000
+
+
+async def run(samples: int = 20, api_clients: int = 16, batch: int = 200,
+              max_slowdown: float = 1.5) -> int:
+    import httpx
+    from main import app
+    from services.invoice_service import warm_up_renderers
+    from services.render_executor import render_executor
+    warm_up_renderers()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 timeout=None) as client:
+        await _form_latencies(client, 3)
+        idle = await _form_latencies(client, samples)
+
+        # One uncontended render, the unit of expected waiting
+        render = await _form_latencies(client, 1)
+
+        stop = asyncio.Event()
+        counts = {}
+        load = [asyncio.ensure_future(_api_client(client, stop, counts))
+                for _ in range(api_clients)]
+        load.append(asyncio.ensure_future(_batch(client, batch)))
+        await asyncio.sleep(0.5)
+        loaded = await _form_latencies(client, samples)
+        lanes = render_executor.stats()["lanes"]
+        stop.set()
+        load[-1].cancel()
+        await asyncio.gather(*load, return_exceptions=True)
+
+    print(f"{'form renders':<14} {'p50 ms':>8} {'p90 ms':>8} {'max ms':>8}")
+    for name, times in (("idle", idle), ("under load", loaded)):
+        print(f"{name:<14} {_p(times, 0.5):>8.1f} {_p(times, 0.9):>8.1f} {times[-1] * 1000:>8.1f}")
+    print(f"api responses during load: {dict(sorted(counts.items()))}")
+    print("lanes: " + ", ".join(f"{name} completed={lane['completed']} rejected={lane['rejected']}"
+                                for name, lane in lanes.items()))
+    limit = _p(idle, 0.5) + max_slowdown * render[0] * 1000
+    if _p(loaded, 0.5) > limit:
+        print(f"FAIL: form p50 under load {_p(loaded, 0.5):.1f} ms exceeds {limit:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--api-clients", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--max-slowdown", type=float, default=1.5)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.samples, args.api_clients, args.batch, args.max_slowdown)))
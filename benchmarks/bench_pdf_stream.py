@@ -0,0 +1,88 @@
+# benchmarks/bench_pdf_stream.py
+"""Compare the in-memory and streaming invoice PDF writers on a large invoice.
+
+Usage: python -m benchmarks.bench_pdf_stream [rows]
+
+Each writer runs in a fresh process so peak RSS is measured separately.
+tests/test_pdf_stream.py runs the streaming writer the same way and fails
+when its memory is no longer bounded per page.
+"""
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.memory import peak_rss_kib, reset_peak_rss
+from models import InvoiceRequest, ProcessedInvoice
+from services.invoice_service import process_invoice_data
+
+
+def large_invoice(rows: int) -> ProcessedInvoice:
+    body = {
+        "invoiceNo": "BENCH-1",
+        "invoiceDate": "2025-01-01",
+        "dueDate": "2025-01-31",
+        "companyName": "Bench Ltd.",
+        "companyAddress": "1 Bench Street\nCity",
+        "clientName": "Bench Client",
+        "clientAddress": "2 Bench Avenue\nCity",
+        "currency": "USD",
+        "lineItems": [{"description": f"Statement line {i}" + ("\nDetail" if i % 7 == 0 else ""),
+                       "quantity": str(i % 9 + 1), "unitPrice": f"{i % 500 + 0.99:.2f}"}
+                      for i in range(rows)],
+        "stamp": "PAID",
+        "notes": "Thank you",
+        "format": "pdf",
+    }
+    return process_invoice_data(InvoiceRequest.model_validate(body))
+
+
+def _peak_rss_mb() -> float:
+    return peak_rss_kib() / 1024
+
+
+def measure(mode: str, rows: int) -> dict:
+    """Render in this process and report time to first chunk, total time and RSS growth."""
+    from imagegen import draw_invoice_pdf_bytes, iter_invoice_pdf_chunks
+    data = large_invoice(rows)
+    # Building the request peaks higher than rendering; measure only the render
+    gc.collect()
+    reset_peak_rss()
+    before = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "stream":
+        first = None
+        size = 0
+        for chunk in iter_invoice_pdf_chunks(data):
+            if first is None:
+                first = time.perf_counter() - start
+            size += len(chunk)    # sent and dropped, as the response does
+    else:
+        size = len(draw_invoice_pdf_bytes(data))
+        first = time.perf_counter() - start
+    return {"mode": mode, "first_s": first, "total_s": time.perf_counter() - start,
+            "bytes": size, "rss_growth_mb": _peak_rss_mb() - before}
+
+
+def run(rows: int = 10_000):
+    print(f"{rows} line items")
+    print(f"{'writer':>8} {'first s':>8} {'total s':>8} {'KiB':>8} {'peak RSS +MB':>13}")
+    for mode in ("memory", "stream"):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_pdf_stream", "--child",
+                              mode, str(rows)], check=True, capture_output=True, text=True)
+        r = json.loads(out.stdout)
+        print(f"{mode:>8} {r['first_s']:>8.3f} {r['total_s']:>8.3f} {r['bytes'] // 1024:>8} "
+              f"{r['rss_growth_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int, nargs="?", default=10_000)
+    parser.add_argument("--child", choices=("memory", "stream"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child, args.rows)))
+    else:
+        run(args.rows)
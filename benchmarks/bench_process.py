@@ -0,0 +1,83 @@
+# benchmarks/bench_process.py
+"""Preprocessing cost of a large invoice batch.
+
+Usage: python -m benchmarks.bench_process [invoices]
+
+Builds a batch (default 100,000) of API requests and form submissions
+whose dates repeat the way a real batch's do (a few months of invoice
+and due dates), then times process_invoice_data over all of it and
+measures the memory the processed invoices hold, per invoice.
+"""
+import argparse
+import datetime
+import gc
+import random
+import time
+import tracemalloc
+
+from models import InvoiceRequest
+from services.invoice_service import process_invoice_data
+
+
+def batch(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1)
+    days = [(start + datetime.timedelta(days=i)).isoformat() for i in range(120)]
+    requests, forms = [], []
+    for i in range(count):
+        date = rng.choice(days)
+        fields = {
+            "invoice_no": f"INV-{i:06d}",
+            "invoice_date": date,
+            "due_date": rng.choice(days),
+            "company_name": "Bench Ltd.",
+            "company_address": "1 Bench Street\nCity",
+            "client_name": f"Client {i % 500}",
+            "client_address": "2 Client Avenue\nCity",
+            "currency": "USD",
+            "item_description": "Consulting",
+            "quantity": str(i % 9 + 1),
+            "unit_price": f"{i % 500 + 0.99:.2f}",
+            "tax_rate": "8",
+            "discount": "0",
+        }
+        if i % 2:
+            forms.append(dict(fields, mark_paid="yes" if i % 4 == 1 else ""))
+        else:
+            requests.append(InvoiceRequest.model_validate(fields))
+    return requests, forms
+
+
+def run(count: int):
+    requests, forms = batch(count)
+    process_invoice_data(requests[0])     # imports and first-call work
+
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    for request in requests:
+        process_invoice_data(request)
+    for form in forms:
+        process_invoice_data(form)
+    took = time.perf_counter() - start
+    gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    processed = [process_invoice_data(r) for r in requests]
+    processed += [process_invoice_data(f) for f in forms]
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{count} invoices ({len(requests)} API, {len(forms)} form)")
+    print(f"preprocess: {took:.3f} s total, {took / count * 1e6:.2f} us per invoice")
+    print(f"held:       {held / 2**20:.1f} MiB, {held / count:.0f} B per invoice")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("invoices", type=int, nargs="?", default=100_000)
+    args = parser.parse_args()
+    run(args.invoices)
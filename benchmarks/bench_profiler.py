@@ -0,0 +1,80 @@
+# benchmarks/bench_profiler.py
+"""Check the render profiler's cost with profiling disabled and enabled.
+
+Usage: python -m benchmarks.bench_profiler [requests] [--sample-rate N]
+
+Each setting runs in a fresh process that posts PNG invoices to
+/api/generate. tests/test_profiler.py runs the same child processes to
+check that disabled profiling never imports the sampler and that enabled
+profiling samples the renderer.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.payloads import invoice_request
+
+
+def measure(requests: int) -> dict:
+    """Time ``requests`` uncached renders in this process and report what the profiler did."""
+    import httpx
+    from main import app
+    from services.invoice_service import warm_up_renderers
+    from services.profiler import profiler
+    from services.render_cache import render_cache
+    warm_up_renderers()
+    body = invoice_request("short", "unpaid", "png")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            times = []
+            for _ in range(requests):
+                render_cache.clear()
+                start = time.perf_counter()
+                response = await client.post("/api/generate", json=body)
+                response.raise_for_status()
+                times.append(time.perf_counter() - start)
+            profile = await client.get("/admin/profile")
+            return sorted(times), profile
+
+    times, profile = asyncio.run(run())
+    return {
+        "sample_rate": profiler.sample_rate,
+        "p50_ms": times[len(times) // 2] * 1000,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "sampler_imported": "profiling" in sys.modules,
+        "profiles": sum(profiler.stats()["profiles"].values()),
+        "profile_status": profile.status_code,
+        "renderer_sampled": "imagegen:draw_invoice_png_bytes" in profile.text,
+    }
+
+
+def run(requests: int = 40, sample_rate: int = 1):
+    print(f"{'sample rate':>12} {'p50 ms':>8} {'mean ms':>8} {'profiles':>9} {'sampler imported':>17}")
+    results = {}
+    for rate in (0, sample_rate):
+        env = dict(os.environ, PROFILE_SAMPLE_RATE=str(rate))
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_profiler", "--child",
+                              str(requests)], env=env, check=True, capture_output=True, text=True)
+        r = results[rate] = json.loads(out.stdout.splitlines()[-1])
+        print(f"{rate or 'off':>12} {r['p50_ms']:>8.2f} {r['mean_ms']:>8.2f} {r['profiles']:>9} "
+              f"{str(r['sampler_imported']):>17}")
+    off, on = results[0], results[sample_rate]
+    print(f"overhead when enabled: {(on['mean_ms'] / off['mean_ms'] - 1) * 100:+.1f}% mean")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("requests", type=int, nargs="?", default=40)
+    parser.add_argument("--sample-rate", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.requests)))
+    else:
+        run(args.requests, args.sample_rate)
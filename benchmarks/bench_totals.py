@@ -0,0 +1,41 @@
+# benchmarks/bench_totals.py
+"""Compare scalar calculate_totals calls with calculate_totals_batch.
+
+Usage: python -m benchmarks.bench_totals [rows...]
+"""
+import random
+import sys
+import time
+
+from services.invoice_service import calculate_totals, calculate_totals_batch, numpy
+
+
+def _columns(rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    quantities = [str(rng.randint(1, 20)) for _ in range(rows)]
+    unit_prices = [f"{rng.uniform(1, 5000):.2f}" for _ in range(rows)]
+    tax_rates = [rng.choice(["0", "5", "8.5", "20"]) for _ in range(rows)]
+    discounts = [rng.choice(["0", "0", "10", "12.5"]) for _ in range(rows)]
+    discounts[::1000] = ["n/a"] * len(discounts[::1000])   # a few unparseable rows
+    return quantities, unit_prices, tax_rates, discounts
+
+
+def run(sizes=(10_000, 100_000, 1_000_000)):
+    print(f"batch arithmetic: {'numpy' if numpy is not None else 'pure Python'}")
+    print(f"{'rows':>9} {'scalar s':>9} {'batch s':>9} {'speedup':>8}")
+    for rows in sizes:
+        cols = _columns(rows)
+        start = time.perf_counter()
+        scalar = [calculate_totals(*row) for row in zip(*cols)]
+        scalar_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = calculate_totals_batch(*cols)
+        batch_s = time.perf_counter() - start
+
+        assert all(batch["total"][i] == scalar[i]["total"] for i in range(rows))
+        print(f"{rows:>9} {scalar_s:>9.3f} {batch_s:>9.3f} {scalar_s / batch_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (10_000, 100_000, 1_000_000))
@@ -0,0 +1,24 @@
+# benchmarks/memory.py
+"""Peak resident memory helpers shared by the benchmark scripts."""
+import resource
+
+
+def reset_peak_rss():
+    """Reset the RSS high-water mark so only what follows is measured (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_kib() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,106 @@
+# benchmarks/payloads.py
+"""Sample invoice payloads shared by the benchmark scripts."""
+
+SAMPLE_INVOICE = {
+    "invoice_no": "2025-55577",
+    "invoice_date": "2025-12-02",
+    "due_date": "2026-01-01",
+    "payment_terms": "Net 30",
+    "company_name": "Your Company Ltd.",
+    "company_address": "123 Business Street\nNew York, NY 10001\nUnited States",
+    "company_tax_id": "US123456789",
+    "company_email": "billing@yourcompany.com",
+    "company_phone": "+1 (555) 123-4567",
+    "client_name": "Client Company Inc.",
+    "client_address": "456 Client Avenue\nLos Angeles, CA 90001\nUnited States",
+    "client_email": "contact@client.com",
+    "client_phone": "+1 (555) 987-6543",
+    "currency": "USD",
+    "payment_method": "Bank Transfer",
+    "item_description": "Professional consulting services\nProject management and delivery",
+    "quantity": "1",
+    "unit_price": "5000.00",
+    "tax_rate": "8.5",
+    "discount": "10",
+    "notes": "Thank you for your business!\nPayment is due within 30 days.",
+    "mark_paid": "yes",
+}
+
+
+def sample_processed(**overrides):
+    """Return SAMPLE_INVOICE run through process_invoice_data."""
+    from services.invoice_service import process_invoice_data
+    form = dict(SAMPLE_INVOICE, **overrides)
+    return process_invoice_data(form)
+
+
+# ---- payload variants for the benchmark suite ----
+LONG_ADDRESS = ("Suite 1400, Building C, 9876 Industrial Parkway North\n"
+                "East Business District, Springfield, IL 62701-1234\n"
+                "Attn: Accounts Payable Department\n"
+                "United States of America")
+LONG_NOTES = ("Thank you for your business! Payment is due within 30 days of the invoice date.\n"
+              "Please include the invoice number as the reference of your bank transfer.\n"
+              "Late payments are subject to a 1.5% monthly service charge.\n"
+              "Questions about this invoice? Contact billing@yourcompany.com.\n"
+              "All amounts are stated in the currency shown above.")
+
+SIZES = ("short", "long")
+PAID = ("unpaid", "paid")
+
+
+def invoice_form(size: str = "short", paid: str = "unpaid") -> dict:
+    """SAMPLE_INVOICE with short or long addresses and notes, paid or unpaid."""
+    form = dict(SAMPLE_INVOICE, mark_paid="yes" if paid == "paid" else "")
+    if size == "short":
+        form.update(company_address="1 Main St", client_address="2 Side St", notes="",
+                    item_description="Consulting")
+    else:
+        form.update(company_address=LONG_ADDRESS, client_address=LONG_ADDRESS, notes=LONG_NOTES)
+    return form
+
+
+def invoice_request(size: str = "short", paid: str = "unpaid", format: str = "png") -> dict:
+    """The same invoice as an /api/generate JSON body."""
+    form = invoice_form(size, paid)
+    return {
+        "invoiceNo": form["invoice_no"],
+        "invoiceDate": form["invoice_date"],
+        "dueDate": form["due_date"],
+        "paymentTerms": form["payment_terms"],
+        "companyName": form["company_name"],
+        "companyAddress": form["company_address"],
+        "companyTaxId": form["company_tax_id"],
+        "companyEmail": form["company_email"],
+        "companyPhone": form["company_phone"],
+        "clientName": form["client_name"],
+        "clientAddress": form["client_address"],
+        "clientEmail": form["client_email"],
+        "clientPhone": form["client_phone"],
+        "currency": form["currency"],
+        "paymentMethod": form["payment_method"],
+        "itemDescription": form["item_description"],
+        "quantity": form["quantity"],
+        "unitPrice": form["unit_price"],
+        "taxRate": form["tax_rate"],
+        "discount": form["discount"],
+        "notes": form["notes"],
+        "markPaid": paid == "paid",
+        "format": format,
+    }
+
+
+def receipt_kwargs(size: str = "short", paid: str = "unpaid") -> dict:
+    """Keyword arguments for draw_receipt_png_bytes / draw_receipt_pdf_bytes."""
+    long = size == "long"
+    return {
+        "company_name": "Northwind Consolidated Trading Company Ltd." if long else "Acme Ltd.",
+        "receipt_no": "R-2025-000123",
+        "received_from": "Dr. Alexandra Konstantinopoulou-Whitfield" if long else "Bob Smith",
+        "receipt_date": "02 December 2025",
+        "currency": "USD",
+        "totalsum": "12345.67" if long else "9.99",
+        "description": ("Annual maintenance contract renewal, including premium support"
+                        if long else "Coffee"),
+        "stamp": "PAID" if paid == "paid" else "",
+    }
@@ -0,0 +1,230 @@
+# benchmarks/suite.py
+"""Render benchmark suite with regression checks against a stored baseline.
+
+Usage: python -m benchmarks.suite [--only SUBSTR] [--iterations N] [--min-time S]
+                                  [--save results.json] [--baseline baseline.json]
+                                  [--threshold PCT] [--metrics p50_ms,peak_heap_kib]
+
+Every target runs against each payload variant (short vs long addresses
+and notes, unpaid vs paid) and reports latency percentiles, throughput,
+output bytes and peak memory: the process's peak RSS during one call
+(Linux; includes Pillow's image buffers, and is comparable between runs
+because cases always run in the same order) and the peak Python heap
+from tracemalloc. Results are saved as JSON with --save; a
+saved file passed as --baseline makes the run exit 1 when any case got
+more than --threshold percent worse on one of --metrics.
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.memory import peak_rss_kib, reset_peak_rss
+from benchmarks.payloads import PAID, SIZES, invoice_form, invoice_request, receipt_kwargs
+
+DEFAULT_METRICS = ("p50_ms", "peak_rss_kib", "peak_heap_kib")
+# Changes smaller than these are noise whatever the percentage
+NOISE_FLOOR = {"p50_ms": 0.01, "p90_ms": 0.02, "p99_ms": 0.05, "mean_ms": 0.01,
+               "peak_rss_kib": 1024, "peak_heap_kib": 16, "bytes": 0}
+# Metrics where higher is better
+HIGHER_IS_BETTER = ("ops_per_s",)
+
+
+# ---- targets: each returns a no-argument callable for one payload variant ----
+
+def _process_invoice_data(size, paid):
+    from services.invoice_service import process_invoice_data
+    form = invoice_form(size, paid)
+    return lambda: process_invoice_data(form)
+
+
+def _invoice_pdf(size, paid):
+    from imagegen import draw_invoice_pdf_bytes
+    from services.invoice_service import process_invoice_data
+    data = process_invoice_data(invoice_form(size, paid))
+    return lambda: draw_invoice_pdf_bytes(data)
+
+
+def _invoice_png(size, paid):
+    from imagegen import draw_invoice_png_bytes
+    from services.invoice_service import process_invoice_data
+    data = process_invoice_data(invoice_form(size, paid))
+    return lambda: draw_invoice_png_bytes(data)
+
+
+def _receipt_png(size, paid):
+    from receipt_png import draw_receipt_png_bytes
+    kwargs = receipt_kwargs(size, paid)
+    return lambda: draw_receipt_png_bytes(**kwargs)
+
+
+def _receipt_pdf(size, paid):
+    from receipt_pdf import draw_receipt_pdf_bytes
+    kwargs = receipt_kwargs(size, paid)
+    return lambda: draw_receipt_pdf_bytes(**kwargs)
+
+
+def _api_generate(format):
+    def target(size, paid):
+        import httpx
+        from main import app
+        from services.render_cache import render_cache
+        body = invoice_request(size, paid, format)
+        loop = asyncio.new_event_loop()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                   base_url="http://bench")
+
+        def call():
+            # Measure the render, not a cache hit
+            render_cache.clear()
+            response = loop.run_until_complete(client.post("/api/generate", json=body))
+            response.raise_for_status()
+            return response.content
+        return call
+    return target
+
+
+TARGETS = {
+    "process_invoice_data": _process_invoice_data,
+    "invoice_pdf": _invoice_pdf,
+    "invoice_png": _invoice_png,
+    "receipt_png": _receipt_png,
+    "receipt_pdf": _receipt_pdf,
+    "api_generate_pdf": _api_generate("pdf"),
+    "api_generate_png": _api_generate("png"),
+}
+
+
+# ---- measurement ----
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(fn, iterations: int = 30, min_time: float = 0.5) -> dict:
+    """Time ``fn`` at least ``iterations`` times and for at least ``min_time`` seconds."""
+    result = fn()    # warm caches and imports outside the measurement
+    size = len(result) if isinstance(result, (bytes, bytearray)) else None
+
+    gc.collect()
+    reset_peak_rss()
+    fn()
+    peak_rss = peak_rss_kib()
+
+    tracemalloc.start()
+    fn()
+    peak_heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = []
+    started = time.perf_counter()
+    while len(times) < iterations or (time.perf_counter() - started < min_time
+                                      and len(times) < 100_000):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    ms = [t * 1000 for t in times]
+    return {
+        "runs": len(times),
+        "p50_ms": round(_percentile(ms, 50), 4),
+        "p90_ms": round(_percentile(ms, 90), 4),
+        "p99_ms": round(_percentile(ms, 99), 4),
+        "mean_ms": round(sum(ms) / len(ms), 4),
+        "ops_per_s": round(len(times) / sum(times), 2),
+        "bytes": size,
+        "peak_rss_kib": peak_rss,
+        "peak_heap_kib": round(peak_heap / 1024, 1),
+    }
+
+
+def run_suite(only: str = "", iterations: int = 30, min_time: float = 0.5) -> dict:
+    from services.invoice_service import warm_up_renderers
+    warm_up_renderers()
+    results = {}
+    print(f"{'case':<36} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9} "
+          f"{'KiB':>7} {'RSS KiB':>8} {'heap KiB':>9}")
+    for target, make in TARGETS.items():
+        for size in SIZES:
+            for paid in PAID:
+                case = f"{target}/{size}-{paid}"
+                if only and only not in case:
+                    continue
+                r = results[case] = measure(make(size, paid), iterations, min_time)
+                kib = f"{r['bytes'] / 1024:.1f}" if r["bytes"] is not None else "-"
+                print(f"{case:<36} {r['p50_ms']:>9.3f} {r['p90_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+                      f"{r['ops_per_s']:>9.1f} {kib:>7} {r['peak_rss_kib']:>8} "
+                      f"{r['peak_heap_kib']:>9.1f}")
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float, metrics=DEFAULT_METRICS) -> list:
+    """Return (case, metric, baseline, current, change %) for every regression."""
+    regressions = []
+    for case, now in current["results"].items():
+        before = baseline["results"].get(case)
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold and abs(new - old) > NOISE_FLOOR.get(metric, 0):
+                regressions.append((case, metric, old, new, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite",
+                                     description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", default="", help="run cases whose name contains this")
+    parser.add_argument("--iterations", type=int, default=30, help="minimum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds per case")
+    parser.add_argument("--save", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=15.0,
+                        help="allowed regression in percent (default 15)")
+    parser.add_argument("--metrics", default=",".join(DEFAULT_METRICS),
+                        help="comma-separated metrics to check against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.only, args.iterations, args.min_time)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {len(results['results'])} cases to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.metrics.split(","))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%:")
+            for case, metric, old, new, change in regressions:
+                print(f"  {case:<36} {metric:<14} {old:>10} -> {new:<10} ({change:+.1f}%)")
+            return 1
+        print(f"\nno regressions over {args.threshold:g}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
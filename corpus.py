@@ -0,0 +1,246 @@
+# corpus.py
+"""Generate a synthetic invoice/receipt corpus for OCR training and testing.
+
+Usage: python -m corpus --count 1000000 --out corpus/ [--kind mixed] [--seed 1]
+
+Documents are rendered on every core and written as images under
+``<out>/images/``, with one JSON line per document in
+``<out>/ground_truth.jsonl`` holding the field values and the pixel
+bounding box of every drawn field (see layout_capture.py). Every
+document is derived from ``(seed, index)`` alone, so an interrupted run
+picks up where it stopped when started again with the same arguments.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from encoders import DEFAULT_PROFILE, ENCODER_PROFILES, IMAGE_FORMATS
+from models import InvoiceRequest, ReceiptRequest
+from services.invoice_service import (process_invoice_data, generate_invoice_with_layout,
+                                      output_file_info, warm_up_renderers)
+from services.receipt_service import process_receipt_data, generate_receipt_with_layout
+
+KINDS = ("invoice", "receipt", "mixed")
+GROUND_TRUTH = "ground_truth.jsonl"
+SETTINGS_FILE = "corpus.json"
+# Settings that must not change between runs writing into the same corpus
+FIXED_SETTINGS = ("seed", "kind", "format", "profile")
+FILES_PER_DIR = 1000
+
+# ---- field distributions ----
+NAME_PARTS = ("Acme", "Northwind", "Globex", "Initech", "Umbrella", "Vandelay", "Stark",
+              "Wayne", "Hooli", "Cyberdyne", "Soylent", "Tyrell", "Blue Sky", "Silver Oak",
+              "Redwood", "Bright Path", "Nordic", "Atlas", "Summit", "Harbor")
+NAME_SUFFIXES = ("Ltd.", "Inc.", "LLC", "GmbH", "S.A.", "B.V.", "AB", "Corp.", "& Co.", "Group")
+FIRST_NAMES = ("Anna", "Ben", "Carla", "David", "Elif", "Farid", "Grace", "Hiro", "Ines",
+               "Jonas", "Kofi", "Lena", "Marco", "Nadia", "Oskar", "Priya", "Quinn", "Rosa")
+LAST_NAMES = ("Smith", "Müller", "Rossi", "Novak", "Garcia", "Kowalski", "Chen", "Okafor",
+              "Larsen", "Dubois", "Tanaka", "Silva", "Ivanova", "O'Brien", "Haddad")
+STREETS = ("Main Street", "Market Street", "Baker Street", "Elm Avenue", "Harbor Road",
+           "Station Road", "Kings Way", "Park Lane", "Mill Lane", "Oak Boulevard")
+CITIES = (("New York, NY 10001", "United States"), ("London EC1A 1BB", "United Kingdom"),
+          ("Berlin 10115", "Germany"), ("Paris 75001", "France"), ("Madrid 28001", "Spain"),
+          ("Amsterdam 1011", "Netherlands"), ("Stockholm 111 20", "Sweden"),
+          ("Toronto, ON M5H", "Canada"), ("Sydney NSW 2000", "Australia"))
+CURRENCIES = ("USD", "EUR", "GBP", "CHF", "SEK", "CAD", "AUD", "JPY")
+SERVICES = ("Consulting services", "Web development", "Software license", "Cloud hosting",
+            "Maintenance contract", "Design work", "Training workshop", "Support plan",
+            "Data migration", "Security audit", "Office supplies", "Marketing campaign")
+PAYMENT_TERMS = ("Net 15", "Net 30", "Net 45", "Net 60", "Due on receipt")
+PAYMENT_METHODS = ("Bank Transfer", "Credit Card", "PayPal", "Direct Debit", "Cheque")
+TAX_RATES = ("0", "5", "7", "8.5", "10", "19", "20", "25")
+DISCOUNTS = ("0", "0", "0", "5", "10", "15")
+STAMPS = ("", "", "", "PAID", "OVERDUE", "VOID", "DRAFT")
+
+
+def _company(rng) -> str:
+    return f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)}"
+
+
+def _person(rng) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _address(rng) -> str:
+    city, country = rng.choice(CITIES)
+    return f"{rng.randint(1, 999)} {rng.choice(STREETS)}\n{city}\n{country}"
+
+
+def _date(rng) -> str:
+    return f"{rng.randint(2015, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _amount(rng) -> str:
+    # Log-uniform between 1 and 100000, so small and large amounts are both common
+    return f"{10 ** rng.uniform(0, 5):.2f}"
+
+
+def random_invoice(rng, format: str = "png", profile: str = DEFAULT_PROFILE) -> dict:
+    """Return an /api/generate request body drawn from the field distributions."""
+    company = _company(rng)
+    slug = company.split()[0].lower()
+    return {
+        "invoiceNo": f"{rng.randint(2015, 2030)}-{rng.randint(1, 99999):05d}",
+        "invoiceDate": _date(rng),
+        "dueDate": _date(rng),
+        "paymentTerms": rng.choice(PAYMENT_TERMS),
+        "companyName": company,
+        "companyAddress": _address(rng),
+        "companyEmail": f"billing@{slug}.example",
+        "companyPhone": f"+1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+        "clientName": rng.choice((_company, _person))(rng),
+        "clientAddress": _address(rng),
+        "currency": rng.choice(CURRENCIES),
+        "paymentMethod": rng.choice(PAYMENT_METHODS),
+        "lineItems": [
+            {"description": rng.choice(SERVICES), "quantity": str(rng.randint(1, 20)),
+             "unitPrice": _amount(rng)}
+            for _ in range(rng.choice((1, 1, 1, 2, 3, 4)))
+        ],
+        "taxRate": rng.choice(TAX_RATES),
+        "discount": rng.choice(DISCOUNTS),
+        "notes": rng.choice(("", "Thank you for your business!")),
+        "stamp": rng.choice(STAMPS),
+        "format": format,
+        "encoderProfile": profile,
+    }
+
+
+def random_receipt(rng, format: str = "png", profile: str = DEFAULT_PROFILE) -> dict:
+    """Return an /api/receipt request body drawn from the field distributions."""
+    return {
+        "receiptNo": f"R-{rng.randint(2015, 2030)}-{rng.randint(1, 999999):06d}",
+        "receiptDate": _date(rng),
+        "companyName": _company(rng),
+        "receivedFrom": rng.choice((_company, _person))(rng),
+        "currency": rng.choice(CURRENCIES),
+        "totalSum": _amount(rng),
+        "description": rng.choice(SERVICES),
+        "stamp": rng.choice(STAMPS),
+        "format": format,
+        "encoderProfile": profile,
+    }
+
+
+def render_document(index: int, settings: dict, out: Path) -> dict:
+    """Render document ``index`` of the corpus, write its image and return its record."""
+    rng = random.Random(f"{settings['seed']}:{index}")
+    kind = settings["kind"]
+    if kind == "mixed":
+        kind = rng.choice(("invoice", "receipt"))
+    if kind == "invoice":
+        body = random_invoice(rng, settings["format"], settings["profile"])
+        fields = process_invoice_data(InvoiceRequest.model_validate(body))
+        data, layout = generate_invoice_with_layout(fields, settings["format"], settings["profile"])
+        fields = fields.as_dict()
+    else:
+        body = random_receipt(rng, settings["format"], settings["profile"])
+        fields = process_receipt_data(ReceiptRequest.model_validate(body))
+        data, layout = generate_receipt_with_layout(fields, settings["format"], settings["profile"])
+
+    ext, _ = output_file_info(settings["format"])
+    rel = Path("images") / f"{index // FILES_PER_DIR:04d}" / f"{index:07d}.{ext}"
+    path = out / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return {"index": index, "kind": kind, "file": rel.as_posix(), "fields": fields,
+            "layout": layout}
+
+
+def _render_chunk(task):
+    indices, settings, out = task
+    return [render_document(i, settings, Path(out)) for i in indices]
+
+
+def _done_indices(path: Path) -> set:
+    """Indices already recorded, dropping a torn last line from an interrupted run."""
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+    for line in data[:complete].splitlines():
+        if line.strip():
+            done.add(json.loads(line)["index"])
+    return done
+
+
+def _check_settings(out: Path, settings: dict) -> None:
+    path = out / SETTINGS_FILE
+    if path.exists():
+        previous = json.loads(path.read_text())
+        changed = [k for k in FIXED_SETTINGS if previous.get(k) != settings[k]]
+        if changed:
+            raise SystemExit(f"{out} was generated with different {', '.join(changed)}; "
+                             f"use a new --out directory or the original settings")
+    path.write_text(json.dumps(settings, indent=2))
+
+
+def generate_corpus(count: int, out: str, seed: int = 0, kind: str = "mixed",
+                    format: str = "png", profile: str = DEFAULT_PROFILE,
+                    workers: int = 0, chunk_size: int = 64) -> int:
+    """Render documents 0..count-1 not yet in the corpus; returns how many were rendered."""
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    settings = {"seed": seed, "kind": kind, "format": format, "profile": profile}
+    _check_settings(out, dict(settings, count=count))
+
+    gt_path = out / GROUND_TRUTH
+    done = _done_indices(gt_path)
+    todo = [i for i in range(count) if i not in done]
+    if not todo:
+        print(f"{out}: all {count} documents already rendered", file=sys.stderr)
+        return 0
+    print(f"{out}: rendering {len(todo)} of {count} documents "
+          f"({len(done)} already done)", file=sys.stderr)
+
+    tasks = [(todo[i:i + chunk_size], settings, str(out))
+             for i in range(0, len(todo), chunk_size)]
+    rendered = 0
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers or os.cpu_count() or 1, initializer=warm_up_renderers) as pool, \
+            open(gt_path, "a", encoding="utf-8") as gt:
+        for records in pool.imap_unordered(_render_chunk, tasks):
+            gt.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            gt.flush()
+            rendered += len(records)
+            elapsed = time.perf_counter() - start
+            print(f"\r{len(done) + rendered}/{count} documents, "
+                  f"{rendered / elapsed:.1f} docs/s", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m corpus", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, required=True, help="total documents in the corpus")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kind", choices=KINDS, default="mixed")
+    parser.add_argument("--format", choices=tuple(IMAGE_FORMATS), default="png")
+    parser.add_argument("--profile", choices=tuple(ENCODER_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--workers", type=int, default=0, help="render processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="documents per worker task")
+    args = parser.parse_args(argv)
+    try:
+        generate_corpus(args.count, args.out, args.seed, args.kind, args.format,
+                        args.profile, args.workers, args.chunk_size)
+    except KeyboardInterrupt:
+        print("\ninterrupted; run the same command again to resume", file=sys.stderr)
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# encoders.py
+from PIL import Image
+import io
+
+from timing import timed
+
+# ---- encoder profiles: speed vs size trade-offs for raster output ----
+# "balanced" matches Pillow's defaults, i.e. the historical output.
+ENCODER_PROFILES = {
+    "fast": {"compress_level": 1, "palette": False, "webp_method": 1,
+             "webp_effort": 25, "jpeg_quality": 80, "optimize": False},
+    "balanced": {"compress_level": 6, "palette": False, "webp_method": 4,
+                 "webp_effort": 80, "jpeg_quality": 90, "optimize": False},
+    "smallest": {"compress_level": 9, "palette": True, "webp_method": 4,
+                 "webp_effort": 100, "jpeg_quality": 85, "optimize": True},
+}
+DEFAULT_PROFILE = "balanced"
+PALETTE_COLORS = 64
+
+# output format -> (Pillow format, media type, file extension)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+
+
+def get_profile(profile: str) -> dict:
+    """Return encoder settings for a profile name, raising on unknown names."""
+    try:
+        return ENCODER_PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown encoder profile {profile!r}; expected one of {', '.join(ENCODER_PROFILES)}"
+        )
+
+
+@timed("encode")
+def encode_image(im, image_format: str = "png", profile: str = DEFAULT_PROFILE) -> bytes:
+    """Encode a rendered RGB image with the given output format and profile."""
+    settings = get_profile(profile)
+    pil_format = IMAGE_FORMATS.get(image_format, IMAGE_FORMATS["png"])[0]
+    buf = io.BytesIO()
+
+    if pil_format == "PNG":
+        if settings["palette"]:
+            # Documents use a handful of colors plus anti-aliasing ramps
+            im = im.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE,
+                             dither=Image.Dither.NONE)
+        im.save(buf, format="PNG", compress_level=settings["compress_level"])
+    elif pil_format == "WEBP":
+        # For lossless WebP, "quality" is the compression effort
+        im.save(buf, format="WEBP", lossless=True, method=settings["webp_method"],
+                quality=settings["webp_effort"])
+    else:
+        im.save(buf, format="JPEG", quality=settings["jpeg_quality"],
+                optimize=settings["optimize"])
+
+    return buf.getvalue()
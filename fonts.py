@@ -0,0 +1,106 @@
+# fonts.py
+from PIL import ImageFont
+from collections import OrderedDict
+from pathlib import Path
+import threading
+
+from timing import timed
+
+# ---- font registry: zero-install (try common system fonts, else fallback) ----
+COMMON_SANS = [
+    "/Library/Fonts/Arial.ttf",                  # macOS
+    "/Library/Fonts/Arial Bold.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",       # macOS system
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",  # Linux
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "C:/Windows/Fonts/arial.ttf",                # Windows
+    "C:/Windows/Fonts/arialbd.ttf",
+]
+
+DEFAULT_FAMILY = "sans"
+MAX_CACHED_FONTS = 64
+
+
+def _is_bold_path(p: str) -> bool:
+    return "Bold" in p or p.lower().endswith("bd.ttf")
+
+
+def _resolve_paths(paths):
+    """Return {(family, weight): [existing paths]} in preference order."""
+    resolved = {(DEFAULT_FAMILY, "bold"): [], (DEFAULT_FAMILY, "regular"): []}
+    for p in paths:
+        if Path(p).is_file():
+            weight = "bold" if _is_bold_path(p) else "regular"
+            resolved[(DEFAULT_FAMILY, weight)].append(p)
+    return resolved
+
+
+class FontRegistry:
+    """Process-wide cache of loaded fonts keyed by (family, weight, size).
+
+    Font paths are resolved once on construction; loaded FreeType fonts are
+    kept in a bounded LRU so renders never probe the disk twice.
+    """
+
+    def __init__(self, paths=COMMON_SANS, maxsize: int = MAX_CACHED_FONTS):
+        self.paths = _resolve_paths(paths)
+        self.maxsize = maxsize
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self, family: str, weight: str, size: int):
+        for p in self.paths.get((family, weight), []):
+            try:
+                return ImageFont.truetype(p, size)
+            except Exception:
+                pass
+        return ImageFont.load_default()
+
+    def get(self, size: int, bold: bool = False, family: str = DEFAULT_FAMILY):
+        key = (family, "bold" if bold else "regular", size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+        font = self._open(*key)
+        with self._lock:
+            self._fonts[key] = font
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.maxsize:
+                self._fonts.popitem(last=False)
+        return font
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._fonts),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+registry = FontRegistry()
+
+
+@timed("fonts")
+def load_font(size: int, bold: bool = False):
+    """Return a cached font of the given size from the shared registry."""
+    return registry.get(size, bold=bold)
+
+
+def font_sm():   return load_font(30, bold=False)
+def font_body(): return load_font(36, bold=False)
+def font_h1():   return load_font(52, bold=True)
+def font_bold(): return load_font(42, bold=True)
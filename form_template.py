@@ -1,10 +1,12 @@
 # form_template.py
 import datetime
+from typing import Optional
 
 
-def get_invoice_form_html() -> str:
-    """Returns the HTML form for invoice generation."""
-    today = datetime.date.today()
+def get_invoice_form_html(today: Optional[datetime.date] = None) -> str:
+    """Returns the HTML form for invoice generation, with default dates for ``today``."""
+    if today is None:
+        today = datetime.date.today()
     due_date = today + datetime.timedelta(days=30)
     
     return f"""
@@ -1,417 +1,370 @@
 # imagegen.py
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageDraw
 import io
+from typing import Any, Dict, Iterator
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import getAscent, stringWidth
 from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
 from receipt_png import draw_receipt_png_bytes
 from receipt_pdf import draw_receipt_pdf_bytes
+from encoders import DEFAULT_PROFILE, encode_image
+from layout_spec import get_plan
+from models import LineTotal, ProcessedInvoice
+from plan_render import draw_plan_png, draw_pdf_ops, pdf_scale
+from pdfstream import StreamingCanvas
+from timing import stage
 
-# ---- constants / colors ----
-W, H = 1600, 1000
-bg = (255, 255, 255)
+# ---- layout: header, Bill To block and table columns live in
+# templates/invoice.json (see layout_spec.py); rows, totals and notes
+# depend on the data and are drawn here from the template's anchors ----
+INVOICE_TEMPLATE = "invoice"
+
+# ---- colors ----
 ink = (17, 24, 39)
 muted = (107, 114, 128)
 border = (229, 231, 235)
-accent = (5, 150, 105)
-
-# ---- font loader: zero-install (try common system fonts, else fallback) ----
-COMMON_SANS = [
-    "/Library/Fonts/Arial.ttf",                  # macOS
-    "/Library/Fonts/Arial Bold.ttf",
-    "/System/Library/Fonts/Helvetica.ttc",       # macOS system
-    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",  # Linux
-    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-    "C:/Windows/Fonts/arial.ttf",                # Windows
-    "C:/Windows/Fonts/arialbd.ttf",
-]
-
-def _load_font(size: int, bold: bool = False):
-    candidates = []
-    if bold:
-        candidates = [p for p in COMMON_SANS if ("Bold" in p or p.lower().endswith("bd.ttf"))]
-    else:
-        candidates = [p for p in COMMON_SANS if ("Bold" not in p and not p.lower().endswith("bd.ttf"))]
-    for p in candidates:
-        try:
-            return ImageFont.truetype(p, size)
-        except Exception:
-            pass
-    return ImageFont.load_default()
-
-def _font_sm():   return _load_font(30, bold=False)
-def _font_body(): return _load_font(36, bold=False)
-def _font_h1():   return _load_font(52, bold=True)
-def _font_bold(): return _load_font(42, bold=True)
-
-
-def draw_invoice_pdf_bytes(data: dict) -> bytes:
-    """Generate a professional invoice PDF with all details."""
+
+# ---- fonts: shared process-wide registry (see fonts.py) ----
+from fonts import font_sm as _font_sm, font_body as _font_body, font_bold as _font_bold
+
+
+def _invoice_values(data: ProcessedInvoice) -> Dict[str, Any]:
+    """Field values the invoice template substitutes."""
+    values = {name: getattr(data, name) for name in ProcessedInvoice.__slots__}
+    values["stamp"] = data.display_stamp
+    return values
+
+
+def _line_items(data: ProcessedInvoice) -> tuple:
+    """Return the invoice rows, falling back to the single-item fields."""
+    if data.line_items:
+        return data.line_items
+    return (LineTotal(data.item_description, data.quantity, data.unit_price, data.subtotal),)
+
+
+# ---- invoice PDF pagination ----
+PDF_TABLE_TOP_CONT = A4[1] - 90     # table header top below the continued-page header
+PDF_ROWS_BOTTOM = 70                # above the footer
+PDF_TOTALS_HEIGHT = 75
+PDF_NOTES_TOP = 165
+PDF_MAX_DESC_LINES = 5
+PDF_ROW_FONT_SIZE = 9
+
+
+def _pdf_row_lines(row: LineTotal) -> int:
+    return max(1, min(PDF_MAX_DESC_LINES, len(row.description.split("\n"))))
+
+
+def _paginate_pdf_rows(row_lines: list, first_row_y: float, cont_row_y: float,
+                       totals_y: float, has_notes: bool):
+    """Assign rows to pages in one linear pass.
+
+    ``first_row_y`` and ``cont_row_y`` are the baselines of the first row
+    on the first and on continued pages, ``totals_y`` where the template
+    puts the totals. Returns ``(pages, totals_y)`` where each page is a
+    list of ``(row_index, item_y)``. Totals go below the last row;
+    ``totals_y`` is None when they (and the notes) do not fit there and
+    need a page of their own.
+    """
+    placed = []
+    pages = []
+    item_y = first_row_y
+    for index, lines in enumerate(row_lines):
+        if placed and item_y - 12 * lines + 4 < PDF_ROWS_BOTTOM:
+            pages.append(placed)
+            placed = []
+            item_y = cont_row_y
+        placed.append((index, item_y))
+        item_y -= 12 * lines + 10
+    pages.append(placed)
+
+    rows_bottom = placed[-1][1] - 12 * row_lines[placed[-1][0]] + 4 if placed else first_row_y
+    totals_y = min(totals_y, rows_bottom - 30) if len(pages) == 1 else rows_bottom - 30
+    floor = PDF_NOTES_TOP if has_notes else PDF_ROWS_BOTTOM - 15
+    if totals_y - PDF_TOTALS_HEIGHT < floor:
+        return pages, None
+    return pages, totals_y
+
+
+def _fit_pdf_text(text: str, font_name: str, size: float, width: float) -> str:
+    """Cut ``text`` to fit ``width`` points."""
+    while text and stringWidth(text, font_name, size) > width:
+        text = text[:-1]
+    return text
+
+
+def draw_invoice_pdf_bytes(data: ProcessedInvoice) -> bytes:
+    """Generate a professional invoice PDF with all details.
+
+    Line items flow across as many pages as needed, repeating the table
+    header on each page, with "Page N of M" footers.
+    """
     buf = io.BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
+    for _ in _draw_invoice_pdf_pages(c, data):
+        pass
+    with stage("encode"):
+        c.save()
+    return buf.getvalue()
+
+
+def iter_invoice_pdf_chunks(data: ProcessedInvoice) -> Iterator[bytes]:
+    """Generate the invoice PDF incrementally, yielding each page once drawn.
+
+    Same drawing as draw_invoice_pdf_bytes, written by StreamingCanvas so
+    only one page is held in memory; the last chunk carries the xref.
+    """
+    c = StreamingCanvas(pagesize=A4)
+    for _ in _draw_invoice_pdf_pages(c, data):
+        yield c.take()
+    c.save()
+    yield c.take()
+
+
+def _draw_invoice_pdf_pages(c, data: ProcessedInvoice):
+    """Draw the invoice on canvas ``c``, yielding after each finished page.
+
+    The first page's header, Bill To block and table header are the
+    invoice template scaled to the page width; the table header is drawn
+    again at the top of every continued page.
+    """
     width, height = A4
-    
-    # Colors
+    plan = get_plan(INVOICE_TEMPLATE)
+    scale = pdf_scale(plan)
+    values = _invoice_values(data)
     ink = (17/255, 24/255, 39/255)
     muted = (107/255, 114/255, 128/255)
-    accent = (5/255, 150/255, 105/255)
-    light_bg = (249/255, 250/255, 251/255)
-    
-    margin = 50
-    y = height - 50
-    
-    # Header - Company Info
-    c.setFillColorRGB(*ink)
-    c.setFont("Helvetica-Bold", 22)
-    c.drawString(margin, y, data["company_name"])
-    y -= 20
-    
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(*muted)
-    for line in data["company_address"].split("\n"):
-        c.drawString(margin, y, line.strip())
-        y -= 12
-    
-    if data["company_email"]:
-        c.drawString(margin, y, f"Email: {data['company_email']}")
-        y -= 12
-    if data["company_phone"]:
-        c.drawString(margin, y, f"Phone: {data['company_phone']}")
-        y -= 12
-    if data["company_tax_id"]:
-        c.drawString(margin, y, f"Tax ID: {data['company_tax_id']}")
-    
-    # Invoice Title and Number (right side)
-    title_y = height - 50
-    c.setFillColorRGB(*accent)
-    c.setFont("Helvetica-Bold", 28)
-    c.drawRightString(width - margin, title_y, "INVOICE")
-    title_y -= 30
-    
-    c.setFillColorRGB(*ink)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawRightString(width - margin, title_y, f"# {data['invoice_no']}")
-    title_y -= 25
-    
-    # Invoice dates
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(*muted)
-    c.drawRightString(width - margin, title_y, f"Date: {data['invoice_date']}")
-    title_y -= 12
-    c.drawRightString(width - margin, title_y, f"Due Date: {data['due_date']}")
-    
-    # PAID stamp if marked as paid
-    if data.get("is_paid", False):
-        c.saveState()
-        c.setFillColorRGB(5/255, 150/255, 105/255)
-        c.setStrokeColorRGB(5/255, 150/255, 105/255)
-        c.setLineWidth(3)
-        c.rotate(15)
-        paid_x = width - 150
-        paid_y = height - 400
-        c.setFont("Helvetica-Bold", 48)
-        c.drawString(paid_x, paid_y, "PAID")
-        c.rect(paid_x - 10, paid_y - 10, 140, 60, stroke=1, fill=0)
-        c.restoreState()
-    
-    # Bill To section
-    y = height - 200
-    c.setFillColorRGB(*ink)
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(margin, y, "BILL TO:")
-    y -= 18
-    
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(margin, y, data["client_name"])
-    y -= 14
-    
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(*muted)
-    for line in data["client_address"].split("\n"):
-        c.drawString(margin, y, line.strip())
-        y -= 12
-    
-    if data["client_email"]:
-        c.drawString(margin, y, data["client_email"])
-        y -= 12
-    if data["client_phone"]:
-        c.drawString(margin, y, data["client_phone"])
-    
-    # Payment info box (right side)
-    info_y = height - 200
-    info_x = width - 250
-    c.setFillColorRGB(*muted)
-    c.setFont("Helvetica", 9)
-    c.drawString(info_x, info_y, "Payment Terms:")
-    c.setFillColorRGB(*ink)
-    c.drawString(info_x + 90, info_y, data["payment_terms"])
-    info_y -= 14
-    
-    c.setFillColorRGB(*muted)
-    c.drawString(info_x, info_y, "Payment Method:")
-    c.setFillColorRGB(*ink)
-    c.drawString(info_x + 90, info_y, data["payment_method"])
-    info_y -= 14
-    
-    c.setFillColorRGB(*muted)
-    c.drawString(info_x, info_y, "Currency:")
-    c.setFillColorRGB(*ink)
-    c.drawString(info_x + 90, info_y, data["currency"])
-    
-    # Items table
-    y = height - 340
-    table_top = y
-    
-    # Table header
-    c.setFillColorRGB(0.95, 0.96, 0.97)
-    c.rect(margin, y - 20, width - 2*margin, 25, fill=1, stroke=0)
-    
-    c.setFillColorRGB(*ink)
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(margin + 10, y - 5, "DESCRIPTION")
-    c.drawRightString(width - margin - 230, y - 5, "QTY")
-    c.drawRightString(width - margin - 130, y - 5, "UNIT PRICE")
-    c.drawRightString(width - margin - 10, y - 5, "AMOUNT")
-    
-    y -= 35
-    
-    # Item row
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(*ink)
-    
-    # Word wrap description
-    desc_lines = data["item_description"].split("\n")
-    for line in desc_lines[:5]:  # Max 5 lines
-        c.drawString(margin + 10, y, line.strip()[:80])
-        y -= 12
-    
-    item_y = table_top - 30
-    c.drawRightString(width - margin - 230, item_y, str(int(data["quantity"])))
-    c.drawRightString(width - margin - 130, item_y, f"{data['unit_price']:.2f}")
-    c.drawRightString(width - margin - 10, item_y, f"{data['subtotal']:.2f}")
-    
-    # Totals section
-    y = height - 520
-    totals_x = width - margin - 200
-    
-    c.setStrokeColorRGB(0.9, 0.9, 0.9)
-    c.line(totals_x - 10, y + 10, width - margin, y + 10)
-    
+
+    def x(name):
+        return plan.anchor(name)[0] * scale
+
+    def baseline(top, font_name, size):
+        return top - getAscent(font_name, size)
+
+    row_font = "Helvetica"
+    row_size = PDF_ROW_FONT_SIZE
+    margin = x("table")
+    right = width - margin
+    table_y = plan.anchor("table")[1]
+    rows_y = plan.anchor("rows")[1]
+    totals_label_y = plan.anchor("totals_label")[1]
+    desc_x, qty_x, price_x, amount_x = (x("col_description"), x("col_quantity"),
+                                        x("col_unit_price"), x("col_amount"))
+    totals_x, totals_value_x = x("totals_label"), x("totals_value")
+
+    # Header, Bill To and table header from the template; the totals
+    # rule is drawn with the totals, wherever they land
+    draw_pdf_ops(c, plan.ops_without("totals"), values, scale, height)
+
+    # Items table, flowed across as many pages as needed
+    rows = _line_items(data)
+    pages, totals_y = _paginate_pdf_rows(
+        [_pdf_row_lines(row) for row in rows],
+        baseline(height - rows_y * scale, row_font, row_size),
+        baseline(PDF_TABLE_TOP_CONT - (rows_y - table_y) * scale, row_font, row_size),
+        baseline(height - totals_label_y * scale, row_font, row_size),
+        bool(data.notes))
+    page_count = len(pages) + (1 if totals_y is None else 0)
+
+    def item_row(row, item_y):
+        c.setFont(row_font, row_size)
+        c.setFillColorRGB(*ink)
+
+        # Description lines, cut to the description column
+        y = item_y
+        for line in row.description.split("\n")[:PDF_MAX_DESC_LINES]:
+            c.drawString(desc_x, y, _fit_pdf_text(line.strip()[:80], row_font, row_size,
+                                                  qty_x - desc_x - 10))
+            y -= 12
+
+        c.drawString(qty_x, item_y, str(int(row.quantity)))
+        c.drawString(price_x, item_y, f"{row.unit_price:.2f}")
+        c.drawRightString(amount_x, item_y, f"{row.amount:.2f}")
+
+    def continued_header():
+        c.setFillColorRGB(*ink)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(margin, height - 50, data.company_name)
+        c.setFillColorRGB(*muted)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(right, height - 50, f"Invoice # {data.invoice_no} (continued)")
+        # Template y=table_y lands at PDF_TABLE_TOP_CONT
+        draw_pdf_ops(c, plan.groups["table_header"], values, scale,
+                     PDF_TABLE_TOP_CONT + table_y * scale)
+
+    def footer(page_no):
+        c.setFont("Helvetica", 8)
+        c.setFillColorRGB(*muted)
+        c.drawCentredString(width/2, 40, f"Invoice {data.invoice_no} - Page {page_no} of {page_count}")
+
+    for page_no, placed in enumerate(pages, start=1):
+        if page_no > 1:
+            continued_header()
+        for index, item_y in placed:
+            item_row(rows[index], item_y)
+        if page_no < page_count:
+            footer(page_no)
+            c.showPage()
+            yield page_no
+
+    if totals_y is None:
+        continued_header()
+        totals_y = baseline(PDF_TABLE_TOP_CONT, row_font, row_size)
+
+    # Totals section; the template's totals rule sits above it as in the PNG
+    y = totals_y
+    totals_top = y + getAscent(row_font, row_size)
+    draw_pdf_ops(c, plan.groups["totals"], values, scale, totals_top + totals_label_y * scale)
+
     c.setFont("Helvetica", 9)
     c.setFillColorRGB(*muted)
-    
+
     # Subtotal
     c.drawString(totals_x, y, "Subtotal:")
     c.setFillColorRGB(*ink)
-    c.drawRightString(width - margin - 10, y, f"{data['currency']} {data['subtotal']:.2f}")
+    c.drawRightString(totals_value_x, y, f"{data.currency} {data.subtotal:.2f}")
     y -= 18
-    
+
     # Discount
-    if data["discount"] > 0:
+    if data.discount > 0:
         c.setFillColorRGB(*muted)
-        c.drawString(totals_x, y, f"Discount ({data['discount']:.1f}%):")
+        c.drawString(totals_x, y, f"Discount ({data.discount:.1f}%):")
         c.setFillColorRGB(*ink)
-        c.drawRightString(width - margin - 10, y, f"-{data['currency']} {data['discount_amount']:.2f}")
+        c.drawRightString(totals_value_x, y, f"-{data.currency} {data.discount_amount:.2f}")
         y -= 18
-    
+
     # Tax
-    if data["tax_rate"] > 0:
+    if data.tax_rate > 0:
         c.setFillColorRGB(*muted)
-        c.drawString(totals_x, y, f"Tax ({data['tax_rate']:.1f}%):")
+        c.drawString(totals_x, y, f"Tax ({data.tax_rate:.1f}%):")
         c.setFillColorRGB(*ink)
-        c.drawRightString(width - margin - 10, y, f"{data['currency']} {data['tax_amount']:.2f}")
+        c.drawRightString(totals_value_x, y, f"{data.currency} {data.tax_amount:.2f}")
         y -= 18
-    
+
     # Total
-    c.setStrokeColorRGB(0.9, 0.9, 0.9)
-    c.line(totals_x - 10, y + 5, width - margin, y + 5)
+    c.setStrokeColorRGB(*(v / 255 for v in border))
+    c.setLineWidth(1)
+    c.line(totals_x - 20 * scale, y + 5, right, y + 5)
     y -= 15
-    
+
     c.setFont("Helvetica-Bold", 12)
     c.setFillColorRGB(*ink)
     c.drawString(totals_x, y, "Total:")
-    c.drawRightString(width - margin - 10, y, f"{data['currency']} {data['total']:.2f}")
-    
+    c.drawRightString(totals_value_x, y, f"{data.currency} {data.total:.2f}")
+
     # Notes section
-    if data["notes"]:
+    if data.notes:
         y = 150
         c.setFont("Helvetica-Bold", 9)
         c.setFillColorRGB(*ink)
-        c.drawString(margin, y, "NOTES:")
+        c.drawString(x("notes"), y, "NOTES:")
         y -= 15
-        
+
         c.setFont("Helvetica", 8)
         c.setFillColorRGB(*muted)
-        for line in data["notes"].split("\n")[:5]:
-            c.drawString(margin, y, line.strip())
+        for line in data.notes.split("\n")[:5]:
+            c.drawString(x("notes"), y, line.strip())
             y -= 12
-    
-    # Footer
-    c.setFont("Helvetica", 8)
-    c.setFillColorRGB(*muted)
-    c.drawCentredString(width/2, 40, f"Invoice {data['invoice_no']} - Page 1")
-    
+
+    footer(page_count)
+
     c.showPage()
-    c.save()
-    
-    buf.seek(0)
-    return buf.getvalue()
+    yield page_count
 
 
-def draw_invoice_png_bytes(data: dict) -> bytes:
-    """Generate a professional invoice PNG with all details."""
-    im = Image.new("RGB", (W, H), bg)
+# ---- invoice PNG ----
+PNG_MAX_ROWS = 4    # rows that fit between the table header and the totals rule
+
+
+def draw_invoice_png_bytes(data: ProcessedInvoice, use_base_layer: bool = True,
+                           profile: str = DEFAULT_PROFILE,
+                           image_format: str = "png", layout=None) -> bytes:
+    """Generate a professional invoice PNG with all details.
+
+    The template's static skeleton (and stamp) comes from a cached base
+    layer with ``use_base_layer``, or is drawn from scratch otherwise;
+    both modes produce identical pixels. ``profile`` and ``image_format``
+    select the encoder (see encoders.py). Pass a LayoutCapture as
+    ``layout`` to record the box of every field.
+    """
+    plan = get_plan(INVOICE_TEMPLATE)
+    im = draw_plan_png(plan, _invoice_values(data), use_base_layer, layout)
     d = ImageDraw.Draw(im)
-    
+
+    def text(field, xy, value, font, fill, anchor=None, line=None):
+        d.text(xy, value, font=font, fill=fill, anchor=anchor)
+        if layout is not None:
+            layout.add(d, field, xy, value, font, anchor, line)
+
     f_sm = _font_sm()
     f_body = _font_body()
-    f_h1 = _font_h1()
     f_bold = _font_bold()
-    
-    margin = 60
-    content_width = W - 2 * margin
-    left_col_width = int(content_width * 0.40)
-    gap = 40
-    right_col_x = margin + left_col_width + gap
-    
-    x = margin
-    y = margin
-    
-    # Company header (left side - 40%)
-    d.text((x, y), data["company_name"], font=f_bold, fill=ink)
-    y += 50
-    
-    # Company address lines
-    addr_lines = data["company_address"].split("\n")[:3]
-    for line in addr_lines:
-        d.text((x, y), line.strip()[:40], font=f_sm, fill=muted)
-        y += 28
-    
-    if data["company_email"]:
-        d.text((x, y), data["company_email"][:40], font=f_sm, fill=muted)
-        y += 28
-    if data["company_phone"]:
-        d.text((x, y), data["company_phone"][:40], font=f_sm, fill=muted)
-    
-    # Invoice title (right side - 60%)
-    title_x = right_col_x
-    title_y = margin
-    d.text((title_x, title_y), "INVOICE", font=f_h1, fill=accent)
-    title_y += 65
-    d.text((title_x, title_y), f"# {data['invoice_no']}", font=f_bold, fill=ink)
-    title_y += 45
-    d.text((title_x, title_y), f"Date: {data['invoice_date']}", font=f_sm, fill=muted)
-    title_y += 30
-    d.text((title_x, title_y), f"Due: {data['due_date']}", font=f_sm, fill=muted)
-    
-    # PAID stamp if marked as paid
-    if data.get("is_paid", False):
-        from PIL import ImageFont
-        paid_font = _load_font(80, bold=True)
-        paid_text = "PAID"
-        # Position for rotated text (center area)
-        paid_x = W - 400
-        paid_y = 400
-        # Create a temporary image for rotation
-        temp_im = Image.new("RGBA", (300, 150), (255, 255, 255, 0))
-        temp_d = ImageDraw.Draw(temp_im)
-        temp_d.text((20, 30), paid_text, font=paid_font, fill=accent)
-        temp_d.rectangle((15, 25, 220, 120), outline=accent, width=8)
-        # Rotate and paste
-        rotated = temp_im.rotate(15, expand=True)
-        im.paste(rotated, (paid_x, paid_y), rotated)
-    
-    # Bill To section (left column - 40%)
-    y = 280
-    d.text((x, y), "BILL TO:", font=f_bold, fill=ink)
-    y += 38
-    d.text((x, y), data["client_name"][:35], font=f_body, fill=ink)
-    y += 38
-    
-    # Client address
-    client_addr_lines = data["client_address"].split("\n")[:3]
-    for line in client_addr_lines:
-        d.text((x, y), line.strip()[:40], font=f_sm, fill=muted)
-        y += 28
-    
-    # Payment info (right column - 60%)
-    info_x = right_col_x
-    info_y = 280
-    d.text((info_x, info_y), "Payment Terms:", font=f_sm, fill=muted)
-    info_y += 28
-    d.text((info_x, info_y), data["payment_terms"][:30], font=f_sm, fill=ink)
-    info_y += 35
-    d.text((info_x, info_y), "Payment Method:", font=f_sm, fill=muted)
-    info_y += 28
-    d.text((info_x, info_y), data["payment_method"][:30], font=f_sm, fill=ink)
-    
-    # Table header
-    y = 480
-    table_y = y
-    d.rectangle((margin, y, W - margin, y + 45), fill=(240, 240, 240))
-    
-    # Column positions
-    desc_col = margin + 20
-    qty_col = margin + left_col_width - 100
-    price_col = right_col_x + 100
-    amount_col = W - margin - 20
-    
-    d.text((desc_col, y + 12), "Description", font=f_body, fill=ink)
-    d.text((qty_col, y + 12), "Qty", font=f_body, fill=ink)
-    d.text((price_col, y + 12), "Unit Price", font=f_body, fill=ink)
-    d.text((amount_col, y + 12), "Amount", font=f_body, fill=ink, anchor="ra")
-    
-    # Item row
-    y += 65
-    item_y = y
-    desc_lines = data["item_description"].split("\n")
-    for i, line in enumerate(desc_lines[:3]):
-        d.text((desc_col, y), line.strip()[:45], font=f_sm, fill=ink)
-        y += 30
-    
-    # Item values aligned to first description line
-    d.text((qty_col, item_y), str(int(data["quantity"])), font=f_body, fill=ink)
-    d.text((price_col, item_y), f"{data['unit_price']:.2f}", font=f_body, fill=ink)
-    d.text((amount_col, item_y), f"{data['subtotal']:.2f}", font=f_body, fill=ink, anchor="ra")
-    
-    # Totals section (aligned to right column)
-    y = max(y + 40, 720)
-    d.line((margin, y, W - margin, y), fill=border, width=2)
-    y += 30
-    
-    totals_label_x = right_col_x
-    totals_value_x = W - margin - 20
-    
+
+    desc_x = plan.anchor("col_description")[0]
+    qty_x = plan.anchor("col_quantity")[0]
+    price_x = plan.anchor("col_unit_price")[0]
+    amount_x = plan.anchor("col_amount")[0]
+    right = plan.width - plan.anchor("table")[0]
+
+    rows = _line_items(data)
+    y = plan.anchor("rows")[1]
+    if len(rows) == 1:
+        # Item row
+        item_y = y
+        desc_lines = rows[0].description.split("\n")
+        for i, line in enumerate(desc_lines[:3]):
+            text("line_items[0].description", (desc_x, y), line.strip()[:45], f_sm, ink, line=i)
+            y += 30
+
+        # Item values aligned to first description line
+        text("line_items[0].quantity", (qty_x, item_y), str(int(rows[0].quantity)), f_body, ink)
+        text("line_items[0].unit_price", (price_x, item_y), f"{rows[0].unit_price:.2f}", f_body, ink)
+        text("line_items[0].amount", (amount_x, item_y), f"{rows[0].amount:.2f}", f_body, ink, "ra")
+    else:
+        # Several rows, one description line each; the PNG is a single
+        # page, so overflow is summarized on the last line
+        shown = rows if len(rows) <= PNG_MAX_ROWS else rows[:PNG_MAX_ROWS - 1]
+        for n, row in enumerate(shown):
+            field = f"line_items[{n}]"
+            text(f"{field}.description", (desc_x, y), row.description.split("\n")[0].strip()[:45], f_sm, ink)
+            text(f"{field}.quantity", (qty_x, y), str(int(row.quantity)), f_sm, ink)
+            text(f"{field}.unit_price", (price_x, y), f"{row.unit_price:.2f}", f_sm, ink)
+            text(f"{field}.amount", (amount_x, y), f"{row.amount:.2f}", f_sm, ink, "ra")
+            y += 35
+        if len(shown) < len(rows):
+            d.text((desc_x, y), f"... and {len(rows) - len(shown)} more items", font=f_sm, fill=muted)
+
+    # Totals section (aligned to right column), below the template's rule
+    totals_label_x, y = plan.anchor("totals_label")
+    totals_value_x = plan.anchor("totals_value")[0]
+
     d.text((totals_label_x, y), "Subtotal:", font=f_body, fill=muted)
-    d.text((totals_value_x, y), f"{data['currency']} {data['subtotal']:.2f}", font=f_body, fill=ink, anchor="ra")
+    text("subtotal", (totals_value_x, y), f"{data.currency} {data.subtotal:.2f}", f_body, ink, "ra")
     y += 40
-    
-    if data["discount"] > 0:
-        d.text((totals_label_x, y), f"Discount ({data['discount']:.1f}%):", font=f_body, fill=muted)
-        d.text((totals_value_x, y), f"-{data['currency']} {data['discount_amount']:.2f}", font=f_body, fill=ink, anchor="ra")
+
+    if data.discount > 0:
+        text("discount", (totals_label_x, y), f"Discount ({data.discount:.1f}%):", f_body, muted)
+        text("discount_amount", (totals_value_x, y), f"-{data.currency} {data.discount_amount:.2f}", f_body, ink, "ra")
         y += 40
-    
-    if data["tax_rate"] > 0:
-        d.text((totals_label_x, y), f"Tax ({data['tax_rate']:.1f}%):", font=f_body, fill=muted)
-        d.text((totals_value_x, y), f"{data['currency']} {data['tax_amount']:.2f}", font=f_body, fill=ink, anchor="ra")
+
+    if data.tax_rate > 0:
+        text("tax_rate", (totals_label_x, y), f"Tax ({data.tax_rate:.1f}%):", f_body, muted)
+        text("tax_amount", (totals_value_x, y), f"{data.currency} {data.tax_amount:.2f}", f_body, ink, "ra")
         y += 40
-    
-    d.line((totals_label_x - 20, y, W - margin, y), fill=border, width=3)
+
+    d.line((totals_label_x - 20, y, right, y), fill=border, width=3)
     y += 20
     d.text((totals_label_x, y), "Total:", font=f_bold, fill=ink)
-    d.text((totals_value_x, y), f"{data['currency']} {data['total']:.2f}", font=f_bold, fill=ink, anchor="ra")
-    
+    text("total", (totals_value_x, y), f"{data.currency} {data.total:.2f}", f_bold, ink, "ra")
+
     # Notes section at bottom
-    if data["notes"]:
-        y = H - 160
-        d.text((margin, y), "NOTES:", font=f_bold, fill=ink)
+    if data.notes:
+        x, y = plan.anchor("notes")
+        d.text((x, y), "NOTES:", font=f_bold, fill=ink)
         y += 38
-        note_lines = data["notes"].split("\n")[:3]
-        for line in note_lines:
-            d.text((margin, y), line.strip()[:90], font=f_sm, fill=muted)
+        note_lines = data.notes.split("\n")[:3]
+        for i, line in enumerate(note_lines):
+            text("notes", (x, y), line.strip()[:90], f_sm, muted, line=i)
             y += 28
-    
-    buf = io.BytesIO()
-    im.save(buf, format="PNG")
-    buf.seek(0)
-    return buf.getvalue()
+
+    return encode_image(im, image_format, profile)
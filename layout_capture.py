@@ -0,0 +1,29 @@
+# layout_capture.py
+from typing import Optional
+
+
+class LayoutCapture:
+    """Collects the pixel bounding box of every field a PNG renderer draws.
+
+    Renderers take an optional ``layout`` argument; when it is None they
+    skip capture entirely, so normal renders pay nothing for it.
+    """
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.fields = []
+
+    def add(self, d, field: str, xy, text: str, font, anchor: Optional[str] = None,
+            line: Optional[int] = None):
+        """Record the textbbox of ``text`` drawn at ``xy`` as ``field``."""
+        if not text:
+            return
+        x0, y0, x1, y1 = d.textbbox(xy, text, font=font, anchor=anchor)
+        entry = {"field": field, "text": text, "bbox": [x0, y0, x1, y1]}
+        if line is not None:
+            entry["line"] = line
+        self.fields.append(entry)
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "height": self.height, "fields": self.fields}
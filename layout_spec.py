@@ -0,0 +1,449 @@
+# layout_spec.py
+"""Declarative document layouts, compiled once into flat render plans.
+
+A template is a JSON file (see templates/receipt.json) listing elements
+in pixel coordinates: ``text``, ``lines``, ``rule``, ``box`` and
+``stamp``. Text may contain ``str.format`` placeholders such as
+``{amount:.2f}``; text without placeholders is static. ``lines`` stacks
+several fields one ``step`` apart, skipping empty ones, for blocks such
+as an address followed by optional contact details. Vertical positions
+are either numbers or references resolved at compile time from font
+metrics:
+
+    {"below": ["id", ...], "min": 420, "dy": 36}   max(bottom of ids, min) + dy
+    {"at": "id", "dy": 20}                          y of element id + dy
+
+Compiling resolves every position, font and color, and splits the
+elements into static ops and field ops, so a render only substitutes
+field values. Documents that draw part of the page in code (table rows,
+totals) read their positions from the template's ``anchors`` and the
+positions of elements with an ``id``, and can redraw a named ``group``
+of elements elsewhere, e.g. a table header on every page. Templates are loaded from TEMPLATE_DIR first, then from
+the built-in templates/ directory, and reloaded when the file changes.
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from string import Formatter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw
+
+from fonts import load_font
+
+BUILTIN_TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+TEMPLATE_DIR = os.environ.get("TEMPLATE_DIR", "")
+
+DEFAULT_COLORS = {
+    "ink": (17, 24, 39),
+    "muted": (107, 114, 128),
+    "border": (229, 231, 235),
+    "accent": (5, 150, 105),
+}
+DEFAULT_FONTS = {
+    "sm": {"size": 30},
+    "body": {"size": 36},
+    "h1": {"size": 52, "bold": True},
+    "bold": {"size": 42, "bold": True},
+}
+
+Color = Union[str, Tuple[int, int, int]]
+YPos = Union[int, float, Dict[str, Any]]
+
+
+# ---- spec: the template as written ----
+
+@dataclass(frozen=True)
+class TextSpec:
+    x: float
+    y: YPos
+    text: str
+    font: str = "body"
+    color: Color = "ink"
+    anchor: Optional[str] = None
+    align: str = "left"          # "right": x is where the text's box ends
+    field: Optional[str] = None  # name reported by layout capture
+    redraw: bool = False         # static, but drawn over the fields before it
+    max_chars: Optional[int] = None
+    id: Optional[str] = None
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LinesSpec:
+    x: float
+    y: YPos
+    step: float
+    items: Tuple[Dict[str, Any], ...]   # {"text", "field", "max_lines", "max_chars"}
+    font: str = "body"
+    color: Color = "ink"
+    max_lines: Optional[int] = None     # cap on the whole stack
+    id: Optional[str] = None
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class RuleSpec:
+    x0: float
+    x1: float
+    y: YPos
+    color: Color = "border"
+    width: int = 2
+    id: Optional[str] = None
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class BoxSpec:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    radius: int = 0
+    outline: Optional[Color] = "border"
+    width: int = 2
+    fill: Optional[Color] = None
+    id: Optional[str] = None
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class StampSpec:
+    x: float                 # left edge, moved left for wide stamps ...
+    y: float
+    right: float = 20        # ... to keep this margin from the right edge
+    field: str = "stamp"
+    under: bool = False      # drawn beneath the fields, into the base layer
+    id: Optional[str] = None
+
+
+ELEMENT_TYPES = {"text": TextSpec, "lines": LinesSpec, "rule": RuleSpec, "box": BoxSpec,
+                 "stamp": StampSpec}
+
+
+@dataclass(frozen=True)
+class Template:
+    name: str
+    width: int
+    height: int
+    background: Tuple[int, int, int]
+    colors: Dict[str, Tuple[int, int, int]]
+    fonts: Dict[str, Dict[str, Any]]
+    elements: Tuple[Any, ...]
+    anchors: Dict[str, Tuple[float, float]]
+    digest: str
+
+
+def _color(value) -> Optional[Color]:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def template_from_dict(spec: Dict[str, Any], digest: str = "", name: str = "") -> Template:
+    """Build a Template from its parsed JSON, raising ValueError on bad input."""
+    elements = []
+    for i, raw in enumerate(spec.get("elements", [])):
+        raw = dict(raw)
+        kind = raw.pop("type", None)
+        if kind not in ELEMENT_TYPES:
+            raise ValueError(f"Element {i}: unknown type {kind!r}")
+        for key in ("color", "outline", "fill"):
+            if key in raw:
+                raw[key] = _color(raw[key])
+        if "items" in raw:
+            raw["items"] = tuple(raw["items"])
+        try:
+            elements.append(ELEMENT_TYPES[kind](**raw))
+        except TypeError as e:
+            raise ValueError(f"Element {i} ({kind}): {e}")
+    colors = dict(DEFAULT_COLORS)
+    colors.update({k: tuple(v) for k, v in spec.get("colors", {}).items()})
+    fonts = dict(DEFAULT_FONTS)
+    fonts.update(spec.get("fonts", {}))
+    if not digest:
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+    return Template(
+        name=spec.get("name", name),
+        width=int(spec["width"]),
+        height=int(spec["height"]),
+        background=tuple(spec.get("background", (255, 255, 255))),
+        colors=colors,
+        fonts=fonts,
+        elements=tuple(elements),
+        anchors={name: tuple(xy) for name, xy in spec.get("anchors", {}).items()},
+        digest=digest,
+    )
+
+
+# ---- plan: the template compiled for rendering ----
+
+class TextOp(NamedTuple):
+    x: float
+    y: float
+    text: str                    # a str.format template when ``formatted``
+    font: Any                    # Pillow font
+    font_role: Dict[str, Any]    # {"size", "bold"} for vector backends
+    fill: Tuple[int, int, int]
+    anchor: Optional[str]
+    align_right: bool
+    field: Optional[str]
+    is_field: bool               # drawn on every render, not in the base layer
+    formatted: bool
+    max_chars: Optional[int] = None
+
+
+class LineItem(NamedTuple):
+    text: str                    # a str.format template
+    field: Optional[str]
+    names: Tuple[str, ...]       # placeholders; the item is skipped when all are empty
+    max_lines: int               # > 1: split on newlines, reporting line numbers
+    max_chars: Optional[int]
+
+
+class LinesOp(NamedTuple):
+    x: float
+    y: float
+    step: float
+    items: Tuple[LineItem, ...]
+    font: Any
+    font_role: Dict[str, Any]
+    fill: Tuple[int, int, int]
+    max_lines: Optional[int]
+
+
+class RuleOp(NamedTuple):
+    x0: float
+    x1: float
+    y: float
+    fill: Tuple[int, int, int]
+    width: int
+
+
+class BoxOp(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    radius: int
+    outline: Optional[Tuple[int, int, int]]
+    width: int
+    fill: Optional[Tuple[int, int, int]]
+
+
+class StampOp(NamedTuple):
+    x: float
+    y: float
+    right: float
+    field: str
+    under: bool
+
+
+class RenderPlan:
+    """A compiled template: every op with absolute positions and loaded fonts.
+
+    ``ops`` keeps template order (used by vector backends); ``static_ops``
+    can be rasterized once into a base layer, after which ``field_ops``
+    are drawn per render. Stamps drawn ``under`` the fields are part of
+    the base layer, so there is one layer per stamp. ``anchors`` maps
+    template anchors and element ids to their ``(x, y)``; ``groups`` maps
+    group names to their ops.
+    """
+
+    def __init__(self, template: Template, ops: List[Any], anchors: Dict[str, Tuple[float, float]],
+                 groups: Dict[str, List[Any]]):
+        self.template = template
+        self.width = template.width
+        self.height = template.height
+        self.background = template.background
+        self.ops = ops
+        self.static_ops = [op for op in ops if not _is_dynamic(op)]
+        self.field_ops = [op for op in ops if _is_dynamic(op)]
+        self.anchors = anchors
+        self.groups = groups
+        self.base_layers = {}    # stamps under the fields -> base layer
+        self.lock = threading.Lock()
+
+    def anchor(self, name: str) -> Tuple[float, float]:
+        try:
+            return self.anchors[name]
+        except KeyError:
+            raise ValueError(f"Template {self.template.name!r} has no anchor {name!r}")
+
+    def ops_without(self, group: str) -> List[Any]:
+        """Every op except those of ``group``, in template order."""
+        excluded = {id(op) for op in self.groups.get(group, ())}
+        return [op for op in self.ops if id(op) not in excluded]
+
+
+def _is_dynamic(op) -> bool:
+    if isinstance(op, StampOp):
+        return not op.under
+    return isinstance(op, LinesOp) or (isinstance(op, TextOp) and op.is_field)
+
+
+def _placeholders(text: str) -> List[str]:
+    return [name for _, name, _, _ in Formatter().parse(text) if name is not None]
+
+
+def compile_template(template: Template) -> RenderPlan:
+    """Resolve positions, fonts and colors of a template into a RenderPlan."""
+    d = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    tops: Dict[str, float] = {}
+    bottoms: Dict[str, float] = {}
+
+    def color(value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            try:
+                return template.colors[value]
+            except KeyError:
+                raise ValueError(f"Template {template.name!r}: unknown color {value!r}")
+        return tuple(value)
+
+    def resolve_y(y):
+        if not isinstance(y, dict):
+            return y
+        try:
+            if "at" in y:
+                base = tops[y["at"]]
+            else:
+                base = max([bottoms[ref] for ref in y.get("below", [])] + [y.get("min", 0)])
+        except KeyError as e:
+            raise ValueError(f"Template {template.name!r}: position refers to unknown or "
+                             f"variable element {e.args[0]!r}; define it earlier")
+        return base + y.get("dy", 0)
+
+    def font(name):
+        role = template.fonts.get(name)
+        if role is None:
+            raise ValueError(f"Template {template.name!r}: unknown font {name!r}")
+        return load_font(int(role["size"]), bold=bool(role.get("bold"))), role
+
+    ops = []
+    anchors: Dict[str, Tuple[float, float]] = dict(template.anchors)
+    groups: Dict[str, List[Any]] = {}
+    for el in template.elements:
+        if isinstance(el, TextSpec):
+            pil_font, role = font(el.font)
+            y = resolve_y(el.y)
+            formatted = bool(_placeholders(el.text))
+            # Static text is stored with {{ }} escapes already applied
+            text = el.text if formatted else el.text.format()
+            op = TextOp(el.x, y, text, pil_font, role, color(el.color), el.anchor,
+                        el.align == "right", el.field, formatted or el.redraw, formatted,
+                        el.max_chars)
+            if el.id:
+                tops[el.id] = y
+                if not formatted:
+                    x0, y0, x1, y1 = d.textbbox((0, 0), text, font=pil_font)
+                    bottoms[el.id] = y + (y1 - y0)
+        elif isinstance(el, LinesSpec):
+            pil_font, role = font(el.font)
+            y = resolve_y(el.y)
+            items = []
+            for item in el.items:
+                if "text" not in item:
+                    raise ValueError(f"Template {template.name!r}: lines item without text")
+                items.append(LineItem(item["text"], item.get("field"),
+                                      tuple(_placeholders(item["text"])),
+                                      int(item.get("max_lines", 1)), item.get("max_chars")))
+            op = LinesOp(el.x, y, el.step, tuple(items), pil_font, role, color(el.color),
+                         el.max_lines)
+            if el.id:
+                tops[el.id] = y
+        elif isinstance(el, RuleSpec):
+            y = resolve_y(el.y)
+            op = RuleOp(el.x0, el.x1, y, color(el.color), el.width)
+            if el.id:
+                tops[el.id] = bottoms[el.id] = y
+        elif isinstance(el, BoxSpec):
+            op = BoxOp(el.x0, el.y0, el.x1, el.y1, el.radius, color(el.outline), el.width,
+                       color(el.fill))
+            if el.id:
+                tops[el.id], bottoms[el.id] = el.y0, el.y1
+        else:
+            op = StampOp(el.x, el.y, el.right, el.field, el.under)
+        if el.id:
+            if isinstance(op, (RuleOp, BoxOp)):
+                anchors[el.id] = (op.x0, tops[el.id])
+            else:
+                anchors[el.id] = (op.x, op.y)
+        if getattr(el, "group", None):
+            groups.setdefault(el.group, []).append(op)
+        ops.append(op)
+    return RenderPlan(template, ops, anchors, groups)
+
+
+def line_texts(op: LinesOp, values: Dict[str, Any]) -> List[Tuple[Optional[str], str,
+                                                                  Optional[int]]]:
+    """The lines a LinesOp draws for ``values``, as ``(field, text, line)``.
+
+    ``line`` numbers the lines of a multi-line item and is None otherwise.
+    """
+    lines = []
+    for item in op.items:
+        if item.names and not any(values.get(name) for name in item.names):
+            continue
+        text = item.text.format_map(values)
+        if item.max_lines > 1:
+            parts = [(part.strip(), n) for n, part in enumerate(text.split("\n")[:item.max_lines])]
+        else:
+            parts = [(text, None)]
+        for part, n in parts:
+            if item.max_chars is not None:
+                part = part[:item.max_chars]
+            lines.append((item.field, part, n))
+    return lines[:op.max_lines] if op.max_lines is not None else lines
+
+
+# ---- loading: built-in and hot-loaded templates ----
+
+_plans: Dict[Tuple[str, int], RenderPlan] = {}
+_plans_lock = threading.Lock()
+
+
+def template_path(name: str) -> Path:
+    """Locate a template by name, preferring TEMPLATE_DIR over the built-ins."""
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        raise ValueError(f"Invalid template name {name!r}")
+    for directory in filter(None, (TEMPLATE_DIR, BUILTIN_TEMPLATE_DIR)):
+        path = Path(directory) / f"{name}.json"
+        if path.is_file():
+            return path
+    raise ValueError(f"Unknown template {name!r}")
+
+
+def has_template(name: str) -> bool:
+    try:
+        template_path(name)
+        return True
+    except ValueError:
+        return False
+
+
+def get_plan(name: str) -> RenderPlan:
+    """Return the compiled plan for a template, recompiling when its file changes."""
+    path = template_path(name)
+    key = (str(path), path.stat().st_mtime_ns)
+    plan = _plans.get(key)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(key)
+            if plan is None:
+                raw = path.read_bytes()
+                template = template_from_dict(json.loads(raw),
+                                              hashlib.sha256(raw).hexdigest(), name)
+                plan = compile_template(template)
+                # Drop plans compiled from older versions of this file
+                for old in [k for k in _plans if k[0] == key[0]]:
+                    del _plans[old]
+                _plans[key] = plan
+    return plan
+
+
+def template_digest(name: str) -> str:
+    """Content hash of a template, for cache keys."""
+    return get_plan(name).template.digest
@@ -1,11 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from pathlib import Path
 
+from api.metrics import StageTimingMiddleware, router as metrics_router
+from api.pages import CachedStaticFiles
 from api.routes import router as api_router
 from api.web_routes import router as web_router
+from services.job_queue import job_queue
+from services.readiness import readiness
+from services.render_executor import render_executor
 
 BASE_DIR = Path(__file__).resolve().parent
 app = FastAPI(title="Invoice Generator API")
@@ -19,12 +22,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+# Outermost, so the timings cover the whole request
+app.add_middleware(StageTimingMiddleware)
+
+static_files = CachedStaticFiles(directory=BASE_DIR / "static")
+app.mount("/static", static_files, name="static")
 
 @app.get("/favicon.ico", include_in_schema=False)
-def favicon():
-    return FileResponse(BASE_DIR / "static" / "favicon.ico")
+async def favicon(request: Request):
+    # Served like /static, with its caching headers and 304s
+    return await static_files.get_response("favicon.ico", request.scope)
+
+@app.on_event("startup")
+async def warm_up():
+    # Starts the render executor and warms renderers; /api/ready reports when done
+    readiness.start()
+    # Resumes render jobs persisted before a restart
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_render_executor():
+    await job_queue.stop()
+    render_executor.shutdown()
 
 # Include routers
 app.include_router(api_router)
 app.include_router(web_router)
+app.include_router(metrics_router)
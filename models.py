@@ -1,6 +1,52 @@
 # models.py
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Union
+import json
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Any, Dict, List, Literal, NamedTuple, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional: request bodies are decoded with the json module
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode a JSON request body, with orjson when it is installed.
+
+    orjson is stricter than the json module (NaN literals, integers over
+    64 bits, non-UTF-8 encodings), so bodies it rejects are decoded again
+    with json.loads: the same bodies are accepted either way, and invalid
+    ones raise json.JSONDecodeError.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+# Output formats a document is rendered in: PDF plus encoders.IMAGE_FORMATS
+OUTPUT_FORMATS = ("pdf", "png", "webp", "jpeg")
+
+
+def output_format(format: str) -> str:
+    """Map a requested format to one of OUTPUT_FORMATS.
+
+    Case is ignored and anything unknown renders as PNG, as it always has;
+    mapping it here keeps metric labels and cache keys to the four formats.
+    """
+    format = format.lower()
+    return format if format in OUTPUT_FORMATS else "png"
+
+
+class LineItem(BaseModel):
+    """A single invoice row"""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    description: str
+    quantity: Union[str, int, float] = "1"
+    unit_price: Union[str, int, float] = Field(..., alias="unitPrice")
 
 
 class InvoiceRequest(BaseModel):
@@ -22,11 +68,131 @@ class InvoiceRequest(BaseModel):
     client_phone: str = Field(default="", alias="clientPhone")
     currency: str
     payment_method: str = Field(default="Bank Transfer", alias="paymentMethod")
-    item_description: str = Field(..., alias="itemDescription")
+    # Single-item fields; required unless line_items is given
+    item_description: str = Field(default="", alias="itemDescription")
     quantity: Union[str, int, float] = "1"
-    unit_price: Union[str, int, float] = Field(..., alias="unitPrice")
+    unit_price: Union[str, int, float] = Field(default="0", alias="unitPrice")
+    line_items: List[LineItem] = Field(default_factory=list, alias="lineItems")
     tax_rate: Union[str, int, float] = Field(default="0", alias="taxRate")
     discount: Union[str, int, float] = "0"
     notes: str = ""
     mark_paid: bool = Field(default=False, alias="markPaid")
+    stamp: Literal["", "PAID", "OVERDUE", "VOID", "DRAFT"] = ""
     format: str = "pdf"
+    encoder_profile: Literal["fast", "balanced", "smallest"] = Field(default="balanced", alias="encoderProfile")
+    include_layout: bool = Field(default=False, alias="includeLayout")
+
+    @field_validator("format")
+    @classmethod
+    def canonical_format(cls, format):
+        return output_format(format)
+
+    @model_validator(mode="after")
+    def check_layout(self):
+        if self.include_layout and self.format == "pdf":
+            raise ValueError("includeLayout is only available for raster formats")
+        return self
+
+    @model_validator(mode="after")
+    def check_items(self):
+        if not self.line_items:
+            missing = [alias for name, alias in (("item_description", "itemDescription"),
+                                                 ("unit_price", "unitPrice"))
+                       if name not in self.model_fields_set]
+            if missing:
+                raise ValueError(f"{' and '.join(missing)} required unless lineItems is given")
+        return self
+
+
+class ReceiptRequest(BaseModel):
+    """Pydantic model for API receipt requests (always PAID, quantity 1)"""
+    model_config = ConfigDict(populate_by_name=True)
+    
+    receipt_no: str = Field(..., alias="receiptNo")
+    receipt_date: str = Field(..., alias="receiptDate")
+    company_name: str = Field(..., alias="companyName")
+    received_from: str = Field(..., alias="receivedFrom")
+    currency: str
+    total_sum: Union[str, int, float] = Field(..., alias="totalSum")
+    description: str = ""
+    stamp: Literal["", "PAID", "OVERDUE", "VOID", "DRAFT"] = ""
+    format: str = "png"
+    encoder_profile: Literal["fast", "balanced", "smallest"] = Field(default="balanced", alias="encoderProfile")
+    template: str = "receipt"
+    include_layout: bool = Field(default=False, alias="includeLayout")
+
+    @field_validator("format")
+    @classmethod
+    def canonical_format(cls, format):
+        return output_format(format)
+
+    @model_validator(mode="after")
+    def check_layout(self):
+        if self.include_layout and self.format == "pdf":
+            raise ValueError("includeLayout is only available for raster formats")
+        return self
+
+    @field_validator("template")
+    @classmethod
+    def check_template(cls, name):
+        from layout_spec import has_template
+        if not has_template(name):
+            raise ValueError(f"Unknown template {name!r}")
+        return name
+
+
+class LineTotal(NamedTuple):
+    """A processed invoice row with its amount"""
+    description: str
+    quantity: float
+    unit_price: float
+    amount: float
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessedInvoice:
+    """An invoice ready to render: display fields and totals, computed once.
+
+    Built by the adapters in services/invoice_service.py, one per input
+    source. Immutable; ``as_dict`` gives the plain dict used
+    for content hashes and JSON records.
+    """
+    invoice_no: str
+    invoice_date: str        # formatted for display
+    due_date: str
+    payment_terms: str
+    company_name: str
+    company_address: str
+    company_tax_id: str
+    company_email: str
+    company_phone: str
+    client_name: str
+    client_address: str
+    client_email: str
+    client_phone: str
+    currency: str
+    payment_method: str
+    item_description: str    # of the first row
+    notes: str
+    is_paid: bool
+    stamp: str
+    # Totals; quantity and unit_price are those of the first row
+    quantity: float
+    unit_price: float
+    subtotal: float
+    discount: float
+    discount_amount: float
+    tax_rate: float
+    tax_amount: float
+    total: float
+    line_items: Tuple[LineTotal, ...]
+
+    @property
+    def display_stamp(self) -> str:
+        """The stamp drawn on the invoice, or "" for none"""
+        return self.stamp or ("PAID" if self.is_paid else "")
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["line_items"] = [row._asdict() for row in self.line_items]
+        return data
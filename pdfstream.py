@@ -0,0 +1,240 @@
+# pdfstream.py
+"""Incremental PDF writer for documents too large to build in memory.
+
+``StreamingCanvas`` implements the subset of the reportlab canvas API the
+invoice renderer uses (text, lines, rectangles, colors, transforms and
+form XObjects). Every page is written out as soon as ``showPage`` is
+called and handed back by ``take()``; only the byte offsets of written
+objects are kept, so memory stays bounded by one page whatever the page
+count. The page tree, shared resources, xref and trailer are written by
+``save()`` at the end, which PDF allows because objects are referenced
+by number.
+
+Text uses the standard 14 Type 1 fonts with WinAnsiEncoding, and numbers
+are formatted, like reportlab does, so the pages match reportlab's and
+no fonts are embedded. Characters outside WinAnsi fall back to the
+Symbol font, or to a box glyph, exactly as in reportlab.
+"""
+import math
+import zlib
+from typing import Dict, List, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth, unicode2T1
+
+# Object numbers fixed up front so pages can refer to them before they are written
+CATALOG_OBJ = 1
+PAGES_OBJ = 2
+RESOURCES_OBJ = 3
+FIRST_FREE_OBJ = 4
+
+HEADER = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+
+
+def _num(value: float) -> str:
+    """Format a number the way reportlab does, so both writers draw the same geometry."""
+    return fp_str(value)
+
+
+def _pdf_string(raw: bytes) -> str:
+    """Escape encoded text as a PDF literal string."""
+    text = raw.decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") \
+        .replace("\r", "\\r").replace("\n", "\\n") + ")"
+
+
+class StreamingCanvas:
+    """Reportlab-compatible canvas that writes each page as it is finished.
+
+    Call ``take()`` after each ``showPage()`` (and after ``save()``) to get
+    the bytes produced since the last call.
+    """
+
+    def __init__(self, pagesize: Tuple[float, float] = A4, compress: bool = True):
+        self.width, self.height = pagesize
+        self.compress = compress
+        self._out = bytearray(HEADER)
+        self._offset = 0             # bytes already handed out by take()
+        self._xref: Dict[int, int] = {}
+        self._next_obj = FIRST_FREE_OBJ
+        self._kids: List[int] = []
+        self._fonts: Dict[str, Tuple[str, str]] = {}   # base font -> (resource, encoding)
+        self._forms: Dict[str, Tuple[str, int]] = {}   # form name -> (resource name, obj)
+        self._page_ops: List[str] = []
+        self._ops = self._page_ops
+        self._form = None
+        self._state = []
+        self._reset_state()
+
+    # ---- object output ----
+
+    def _alloc(self) -> int:
+        num = self._next_obj
+        self._next_obj += 1
+        return num
+
+    def _write_obj(self, num: int, body: bytes):
+        self._xref[num] = self._offset + len(self._out)
+        self._out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+
+    def _write_stream(self, num: int, dictionary: str, ops: List[str]):
+        data = "\n".join(ops).encode("latin-1")
+        if self.compress:
+            data = zlib.compress(data)
+            dictionary += " /Filter /FlateDecode"
+        dictionary = ("%s /Length %d" % (dictionary, len(data))).strip()
+        self._write_obj(num, b"<< %s >>\nstream\n" % dictionary.encode("ascii")
+                        + data + b"\nendstream")
+
+    def take(self) -> bytes:
+        """Return the bytes written since the last call and forget them."""
+        chunk = bytes(self._out)
+        self._offset += len(chunk)
+        self._out = bytearray()
+        return chunk
+
+    # ---- graphics state ----
+
+    def _reset_state(self):
+        self._font = ("Helvetica", 12)
+
+    def saveState(self):
+        self._state.append(self._font)
+        self._ops.append("q")
+
+    def restoreState(self):
+        self._font = self._state.pop()
+        self._ops.append("Q")
+
+    def setFillColorRGB(self, r, g, b):
+        self._ops.append(f"{_num(r)} {_num(g)} {_num(b)} rg")
+
+    def setStrokeColorRGB(self, r, g, b):
+        self._ops.append(f"{_num(r)} {_num(g)} {_num(b)} RG")
+
+    def setLineWidth(self, width):
+        self._ops.append(f"{_num(width)} w")
+
+    def setFont(self, name: str, size: float):
+        self._font = (name, size)
+
+    def rotate(self, theta: float):
+        rad = math.radians(theta)
+        c, s = math.cos(rad), math.sin(rad)
+        self._ops.append(f"{_num(c)} {_num(s)} {_num(-s)} {_num(c)} 0 0 cm")
+
+    def translate(self, dx: float, dy: float):
+        self._ops.append(f"1 0 0 1 {_num(dx)} {_num(dy)} cm")
+
+    # ---- drawing ----
+
+    def stringWidth(self, text: str, name: str = None, size: float = None) -> float:
+        return stringWidth(text, name or self._font[0], size or self._font[1])
+
+    def _font_resource(self, font) -> str:
+        entry = self._fonts.get(font.fontName)
+        if entry is None:
+            entry = self._fonts[font.fontName] = (f"F{len(self._fonts) + 1}", font.encName)
+        return entry[0]
+
+    def drawString(self, x: float, y: float, text: str):
+        name, size = self._font
+        font = getFont(name)
+        ops = ["BT"]
+        current = None
+        # Split the text into runs per font as reportlab does: characters
+        # outside WinAnsi go to the Symbol font, or to a ZapfDingbats box
+        for n, (run_font, raw) in enumerate(unicode2T1(text, [font] + font.substitutionFonts)):
+            if run_font is not current:
+                ops.append(f"/{self._font_resource(run_font)} {_num(size)} Tf")
+                current = run_font
+            if n == 0:
+                ops.append(f"{_num(x)} {_num(y)} Td")
+            ops.append(f"{_pdf_string(raw)} Tj")
+        ops.append("ET")
+        self._ops.append(" ".join(ops))
+
+    def drawRightString(self, x: float, y: float, text: str):
+        self.drawString(x - self.stringWidth(text), y, text)
+
+    def drawCentredString(self, x: float, y: float, text: str):
+        self.drawString(x - self.stringWidth(text) / 2, y, text)
+
+    def line(self, x1: float, y1: float, x2: float, y2: float):
+        self._ops.append(f"{_num(x1)} {_num(y1)} m {_num(x2)} {_num(y2)} l S")
+
+    def rect(self, x: float, y: float, width: float, height: float, stroke: int = 1,
+             fill: int = 0):
+        paint = {(1, 0): "S", (0, 1): "f", (1, 1): "B"}.get((bool(stroke), bool(fill)), "n")
+        self._ops.append(f"{_num(x)} {_num(y)} {_num(width)} {_num(height)} re {paint}")
+
+    # ---- form XObjects, written once and reused by every page ----
+
+    def hasForm(self, name: str) -> bool:
+        return name in self._forms
+
+    def beginForm(self, name: str, lowerx: float = 0, lowery: float = 0,
+                  upperx: float = None, uppery: float = None):
+        bbox = (lowerx, lowery, self.width if upperx is None else upperx,
+                self.height if uppery is None else uppery)
+        self._form = (name, bbox, self._font)
+        self._ops = []
+
+    def endForm(self):
+        name, bbox, self._font = self._form
+        num = self._alloc()
+        self._write_stream(num, "/Type /XObject /Subtype /Form /BBox [%s] /Resources %d 0 R"
+                           % (" ".join(_num(v) for v in bbox), RESOURCES_OBJ), self._ops)
+        self._forms[name] = (f"X{len(self._forms) + 1}", num)
+        self._form = None
+        self._ops = self._page_ops
+
+    def doForm(self, name: str):
+        self._ops.append(f"/{self._forms[name][0]} Do")
+
+    # ---- pages and document ----
+
+    def showPage(self):
+        """Write the current page out and start a new one."""
+        contents = self._alloc()
+        self._write_stream(contents, "", self._page_ops)
+        page = self._alloc()
+        self._write_obj(page, (
+            "<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Resources %d 0 R "
+            "/Contents %d 0 R >>" % (PAGES_OBJ, _num(self.width), _num(self.height),
+                                     RESOURCES_OBJ, contents)).encode("ascii"))
+        self._kids.append(page)
+        self._page_ops.clear()
+        self._state.clear()
+        self._reset_state()
+
+    def save(self):
+        """Write the page tree, resources, xref and trailer."""
+        if self._page_ops:
+            self.showPage()
+        fonts = []
+        for base, (resource, encoding) in self._fonts.items():
+            num = self._alloc()
+            # Symbol and ZapfDingbats use their built-in encodings
+            extra = " /Encoding /WinAnsiEncoding" if encoding == "WinAnsiEncoding" else ""
+            self._write_obj(num, ("<< /Type /Font /Subtype /Type1 /BaseFont /%s%s >>"
+                                  % (base, extra)).encode("ascii"))
+            fonts.append(f"/{resource} {num} 0 R")
+        forms = [f"/{resource} {num} 0 R" for resource, num in self._forms.values()]
+        self._write_obj(RESOURCES_OBJ, ("<< /ProcSet [/PDF /Text] /Font << %s >> "
+                                        "/XObject << %s >> >>"
+                                        % (" ".join(fonts), " ".join(forms))).encode("ascii"))
+        self._write_obj(PAGES_OBJ, ("<< /Type /Pages /Count %d /Kids [%s] >>"
+                                    % (len(self._kids),
+                                       " ".join(f"{k} 0 R" for k in self._kids))).encode("ascii"))
+        self._write_obj(CATALOG_OBJ, b"<< /Type /Catalog /Pages %d 0 R >>" % PAGES_OBJ)
+
+        size = self._next_obj
+        xref_at = self._offset + len(self._out)
+        lines = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for num in range(1, size):
+            lines.append(b"%010d 00000 n \n" % self._xref[num])
+        self._out += b"".join(lines)
+        self._out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            size, CATALOG_OBJ, xref_at)
@@ -0,0 +1,205 @@
+# plan_render.py
+"""PNG and PDF backends that execute a compiled RenderPlan (see layout_spec.py)."""
+import io
+import math
+from typing import Any, Dict
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import getAscent, stringWidth
+from reportlab.pdfgen import canvas
+
+from encoders import DEFAULT_PROFILE, encode_image
+from layout_spec import BoxOp, LinesOp, RenderPlan, RuleOp, StampOp, TextOp, line_texts
+from stamps import STAMP_ANGLE, STAMP_COLORS, draw_pdf_stamp, get_png_stamp
+from timing import stage
+
+# PDF page size; the plan is scaled to the page width and drawn from the top
+PDF_PAGE_SIZE = A4
+
+
+def _text(op: TextOp, values: Dict[str, Any]) -> str:
+    text = op.text.format_map(values) if op.formatted else op.text
+    return text if op.max_chars is None else text[:op.max_chars]
+
+
+# ---- PNG ----
+
+def _draw_png_op(im, d, op, values: Dict[str, Any], layout=None):
+    if isinstance(op, TextOp):
+        text = _text(op, values)
+        x = op.x
+        if op.align_right:
+            x0, _, x1, _ = d.textbbox((0, 0), text, font=op.font)
+            x -= x1 - x0
+        d.text((x, op.y), text, font=op.font, fill=op.fill, anchor=op.anchor)
+        if layout is not None and op.field:
+            layout.add(d, op.field, (x, op.y), text, op.font, op.anchor)
+    elif isinstance(op, LinesOp):
+        y = op.y
+        for field, text, line in line_texts(op, values):
+            d.text((op.x, y), text, font=op.font, fill=op.fill)
+            if layout is not None and field:
+                layout.add(d, field, (op.x, y), text, op.font, None, line)
+            y += op.step
+    elif isinstance(op, RuleOp):
+        d.line((op.x0, op.y, op.x1, op.y), fill=op.fill, width=op.width)
+    elif isinstance(op, BoxOp):
+        box = (op.x0, op.y0, op.x1, op.y1)
+        if op.radius:
+            d.rounded_rectangle(box, radius=op.radius, outline=op.outline, width=op.width,
+                                fill=op.fill)
+        else:
+            d.rectangle(box, outline=op.outline, width=op.width, fill=op.fill)
+    elif isinstance(op, StampOp):
+        stamp = values.get(op.field)
+        if stamp:
+            sprite = get_png_stamp(stamp)
+            x = min(op.x, im.width - sprite.width - op.right)
+            im.paste(sprite, (int(x), int(op.y)), sprite)
+
+
+def _draw_static(plan: RenderPlan, values: Dict[str, Any]):
+    layer = Image.new("RGB", (plan.width, plan.height), plan.background)
+    d = ImageDraw.Draw(layer)
+    for op in plan.static_ops:
+        _draw_png_op(layer, d, op, values)
+    return layer
+
+
+def _base_layer(plan: RenderPlan, values: Dict[str, Any]):
+    """Return the cached static layer for the stamps under the fields."""
+    key = tuple(values.get(op.field) or "" for op in plan.static_ops
+                if isinstance(op, StampOp))
+    if any(stamp not in STAMP_COLORS for stamp in key if stamp):
+        # Free-form stamps are not cached so the layer set stays bounded
+        return _draw_static(plan, values)
+    layer = plan.base_layers.get(key)
+    if layer is None:
+        with plan.lock:
+            layer = plan.base_layers.get(key)
+            if layer is None:
+                layer = plan.base_layers[key] = _draw_static(plan, values)
+    return layer
+
+
+def draw_plan_png(plan: RenderPlan, values: Dict[str, Any], use_base_layer: bool = True,
+                  layout=None):
+    """Render a plan as a Pillow image, substituting ``values`` into its fields.
+
+    The static ops are rasterized once per plan into a cached base layer
+    (or drawn from scratch without ``use_base_layer``; the pixels match).
+    Pass a LayoutCapture as ``layout`` to record the box of every field.
+    """
+    if use_base_layer:
+        im = _base_layer(plan, values).copy()
+    else:
+        im = _draw_static(plan, values)
+    d = ImageDraw.Draw(im)
+
+    if layout is not None:
+        layout.width, layout.height = plan.width, plan.height
+        # Static fields sit in the base layer; their boxes never change
+        for op in plan.static_ops:
+            if isinstance(op, TextOp) and op.field:
+                x = op.x
+                if op.align_right:
+                    x0, _, x1, _ = d.textbbox((0, 0), op.text, font=op.font)
+                    x -= x1 - x0
+                layout.add(d, op.field, (x, op.y), op.text, op.font, op.anchor)
+
+    for op in plan.field_ops:
+        _draw_png_op(im, d, op, values, layout)
+    return im
+
+
+def draw_plan_png_bytes(plan: RenderPlan, values: Dict[str, Any],
+                        profile: str = DEFAULT_PROFILE, image_format: str = "png",
+                        use_base_layer: bool = True, layout=None) -> bytes:
+    """Render a plan as an encoded image (see draw_plan_png)."""
+    im = draw_plan_png(plan, values, use_base_layer, layout)
+    return encode_image(im, image_format, profile)
+
+
+# ---- PDF ----
+
+def draw_pdf_ops(c, ops, values: Dict[str, Any], scale: float, top: float):
+    """Draw plan ops on reportlab canvas ``c``.
+
+    Plan coordinates are multiplied by ``scale``; plan y=0 lands at page
+    height ``top``.
+    """
+    def rgb(color):
+        return [v / 255 for v in color]
+
+    for op in ops:
+        if isinstance(op, TextOp):
+            text = _text(op, values)
+            font_name = "Helvetica-Bold" if op.font_role.get("bold") else "Helvetica"
+            size = op.font_role["size"] * scale
+            x = op.x * scale
+            # Pillow positions text by its top; PDF by its baseline
+            y = top - op.y * scale - getAscent(font_name, size)
+            c.setFillColorRGB(*rgb(op.fill))
+            c.setFont(font_name, size)
+            if op.align_right:
+                x -= stringWidth(text, font_name, size)
+            if op.anchor and op.anchor[0] == "r":
+                c.drawRightString(x, y, text)
+            elif op.anchor and op.anchor[0] == "m":
+                c.drawCentredString(x, y, text)
+            else:
+                c.drawString(x, y, text)
+        elif isinstance(op, LinesOp):
+            font_name = "Helvetica-Bold" if op.font_role.get("bold") else "Helvetica"
+            size = op.font_role["size"] * scale
+            c.setFillColorRGB(*rgb(op.fill))
+            c.setFont(font_name, size)
+            y = top - op.y * scale - getAscent(font_name, size)
+            for _, text, _ in line_texts(op, values):
+                c.drawString(op.x * scale, y, text)
+                y -= op.step * scale
+        elif isinstance(op, RuleOp):
+            y = top - op.y * scale
+            c.setStrokeColorRGB(*rgb(op.fill))
+            c.setLineWidth(op.width * scale)
+            c.line(op.x0 * scale, y, op.x1 * scale, y)
+        elif isinstance(op, BoxOp):
+            if op.outline is not None:
+                c.setStrokeColorRGB(*rgb(op.outline))
+                c.setLineWidth(op.width * scale)
+            if op.fill is not None:
+                c.setFillColorRGB(*rgb(op.fill))
+            box = (op.x0 * scale, top - op.y1 * scale, (op.x1 - op.x0) * scale,
+                   (op.y1 - op.y0) * scale)
+            stroke, fill = int(op.outline is not None), int(op.fill is not None)
+            if op.radius:
+                c.roundRect(*box, op.radius * scale, stroke=stroke, fill=fill)
+            else:
+                c.rect(*box, stroke=stroke, fill=fill)
+        elif isinstance(op, StampOp):
+            stamp = values.get(op.field)
+            if stamp:
+                # draw_pdf_stamp takes rotated coordinates: undo the rotation
+                # of the point where the stamp's baseline should start
+                px, py = (op.x + 30) * scale, top - (op.y + 140) * scale
+                a = math.radians(STAMP_ANGLE)
+                draw_pdf_stamp(c, px * math.cos(a) + py * math.sin(a),
+                               -px * math.sin(a) + py * math.cos(a), stamp)
+
+
+def pdf_scale(plan: RenderPlan, pagesize=PDF_PAGE_SIZE) -> float:
+    """Scale that fits the plan's width (and height) on a PDF page."""
+    return min(pagesize[0] / plan.width, pagesize[1] / plan.height)
+
+
+def draw_plan_pdf_bytes(plan: RenderPlan, values: Dict[str, Any]) -> bytes:
+    """Render a plan as a one-page A4 PDF, scaled to the page width."""
+    width, height = PDF_PAGE_SIZE
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=PDF_PAGE_SIZE)
+    draw_pdf_ops(c, plan.ops, values, pdf_scale(plan), height)
+    c.showPage()
+    with stage("encode"):
+        c.save()
+    return buf.getvalue()
@@ -0,0 +1,63 @@
+# profiling.py
+"""Stack sampling for renders picked by the profiler (services/profiler.py).
+
+``run_profiled`` wraps ``timing.run_timed``: while the render runs, a
+sampler thread reads the render thread's stack every few milliseconds
+and counts each distinct stack in the collapsed format flame graph tools
+take (``root;caller;callee``). It runs wherever the render runs, so a
+process render executor profiles inside the worker and the counts come
+back with the result.
+
+Nothing imports this module unless profiling is enabled.
+"""
+import sys
+import threading
+from typing import Dict
+
+from timing import run_timed
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's stack until stopped, counting collapsed stacks.
+
+    Frames at and below ``stop_code`` (the executor plumbing around the
+    render) are left out, so stacks start at the render function.
+    """
+
+    def __init__(self, thread_id: int, interval: float, stop_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_profiled(interval: float, fn, *args):
+    """Like ``run_timed``, sampling the call's stack; returns ``(result, stages, stacks)``."""
+    with StackSampler(threading.get_ident(), interval, run_timed.__code__) as sampler:
+        result, stages = run_timed(fn, *args)
+    return result, stages, sampler.stacks
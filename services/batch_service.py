@@ -0,0 +1,220 @@
+# services/batch_service.py
+import asyncio
+import base64
+import json
+import os
+import re
+import zipfile
+from typing import Any, AsyncIterator, Dict, List
+
+from pydantic import ValidationError
+
+from models import InvoiceRequest, ReceiptRequest, loads
+from services.invoice_service import (process_invoice_data, generate_invoice_bytes,
+                                      generate_invoice_with_layout, layout_body, output_file_info)
+from services.receipt_service import (process_receipt_data, generate_receipt_bytes,
+                                      generate_receipt_with_layout)
+from services.metrics import count_error, count_output
+from services.render_cache import render_cache, cache_key
+from services.render_executor import render_executor, RenderQueueFull
+
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 50000))
+# How long to back off when the shared render queue is full
+QUEUE_FULL_BACKOFF = 0.05
+
+# document kind -> (request model, processor, renderer, layout renderer, number field)
+DOCUMENT_KINDS = {
+    "invoice": (InvoiceRequest, process_invoice_data, generate_invoice_bytes,
+                generate_invoice_with_layout, "invoice_no"),
+    "receipt": (ReceiptRequest, process_receipt_data, generate_receipt_bytes,
+                generate_receipt_with_layout, "receipt_no"),
+}
+
+
+class BadLine:
+    """An NDJSON line that could not be decoded; reported as that item's error."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def parse_batch_body(body: bytes, content_type: str = "") -> List[Any]:
+    """Parse a JSON array or NDJSON body into a list of raw invoice items.
+
+    A malformed JSON array fails the whole body with ValueError; in NDJSON
+    each line stands alone, so a malformed line becomes a BadLine item and
+    the other lines are still rendered.
+    """
+    stripped = body.strip()
+    if not stripped:
+        return []
+    if "ndjson" not in content_type and stripped.startswith(b"["):
+        items = loads(stripped.decode("utf-8"))
+        if not isinstance(items, list):
+            raise ValueError("Batch body must be a JSON array or NDJSON")
+        return items
+    items = []
+    for line in stripped.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(loads(line.decode("utf-8")))
+        except ValueError as e:
+            items.append(BadLine(f"line {len(items) + 1} is not valid JSON: {e}"))
+    return items
+
+
+class _ChunkSink:
+    """Unseekable file object that collects zipfile output for streaming."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def render_item(index: int, item: Any, kind: str = "invoice") -> Dict[str, Any]:
+    """Validate and render one batch item in the bulk lane, never raising."""
+    model, process, generate, generate_layout, number_field = DOCUMENT_KINDS[kind]
+    entry = {"index": index}
+    if isinstance(item, BadLine):
+        entry.update(status="error", error=f"Invalid {kind}: {item.error}")
+        return entry
+    try:
+        document = model.model_validate(item)
+    except ValidationError as e:
+        entry.update(status="error", error=f"Invalid {kind}: {e.errors(include_url=False)}")
+        return entry
+
+    number = getattr(document, number_field)
+    entry[number_field] = number
+    try:
+        processed = process(document)
+        with_layout = document.include_layout
+        key = cache_key(processed, document.format, document.encoder_profile,
+                        "layout" if with_layout else "")
+        data = render_cache.get(key)
+        while data is None:
+            try:
+                if with_layout:
+                    image, layout = await render_executor.run(
+                        generate_layout, processed, document.format, document.encoder_profile,
+                        lane="bulk",
+                    )
+                    data = layout_body(image, layout, document.format)
+                else:
+                    data = await render_executor.run(
+                        generate, processed, document.format, document.encoder_profile,
+                        lane="bulk",
+                    )
+            except RenderQueueFull:
+                await asyncio.sleep(QUEUE_FULL_BACKOFF)
+                continue
+            render_cache.put(key, data)
+        if with_layout:
+            body = json.loads(data)
+            data = base64.b64decode(body["data"])
+            entry["_layout"] = body["layout"]
+    except Exception as e:
+        count_error(kind, document.format)
+        entry.update(status="error", error=f"Error generating {kind}: {str(e)}")
+        return entry
+
+    ext, media_type = output_file_info(document.format)
+    safe_no = re.sub(r"[^A-Za-z0-9._-]", "_", number)
+    entry.update(status="ok", filename=f"{index:05d}_{kind}_{safe_no}.{ext}",
+                 media_type=media_type, bytes=len(data))
+    count_output(kind, document.format, len(data))
+    entry["_data"] = data
+    return entry
+
+
+async def _completed_items(items: List[Any], kind: str,
+                           concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """Render ``items`` with bounded concurrency, yielding entries as they finish."""
+    pending = set()
+    next_index = 0
+    try:
+        while pending or next_index < len(items):
+            while next_index < len(items) and len(pending) < concurrency:
+                pending.add(asyncio.ensure_future(
+                    render_item(next_index, items[next_index], kind)))
+                next_index += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Client went away: stop waiting on renders nobody will receive
+        for task in pending:
+            task.cancel()
+
+
+async def stream_batch_zip(items: List[Any], concurrency: int = 0,
+                           kind: str = "invoice") -> AsyncIterator[bytes]:
+    """Render ``items`` concurrently and yield a ZIP archive entry by entry.
+
+    Entries are written in completion order and each is flushed to the
+    client as soon as it is rendered; at most ``concurrency`` rendered
+    documents are held in memory at once. Items that ask for their layout
+    get a ``.layout.json`` sidecar. A final ``manifest.json`` lists the
+    outcome of every item, including per-item errors.
+    """
+    sink = _ChunkSink()
+    manifest = []
+    entries = _completed_items(items, kind, concurrency or render_executor.workers)
+
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            async for entry in entries:
+                data = entry.pop("_data", None)
+                layout = entry.pop("_layout", None)
+                if data is not None:
+                    zf.writestr(entry["filename"], data)
+                    if layout is not None:
+                        entry["layout_file"] = entry["filename"].rsplit(".", 1)[0] + ".layout.json"
+                        zf.writestr(entry["layout_file"], json.dumps(layout))
+                    yield sink.drain()
+                manifest.append(entry)
+
+            manifest.sort(key=lambda e: e["index"])
+            zf.writestr("manifest.json", json.dumps({
+                "total": len(items),
+                "succeeded": sum(1 for e in manifest if e["status"] == "ok"),
+                "failed": sum(1 for e in manifest if e["status"] != "ok"),
+                "items": manifest,
+            }, indent=2))
+        yield sink.drain()
+    finally:
+        await entries.aclose()
+
+
+async def stream_batch_ndjson(items: List[Any], concurrency: int = 0,
+                              kind: str = "invoice") -> AsyncIterator[bytes]:
+    """Render ``items`` concurrently and yield one JSON line per item.
+
+    Lines are written in completion order; each carries the item's
+    ``index`` and status, and successful items carry the document as
+    base64 in ``data`` (and its field boxes in ``layout`` if requested).
+    """
+    entries = _completed_items(items, kind, concurrency or render_executor.workers)
+    try:
+        async for entry in entries:
+            data = entry.pop("_data", None)
+            layout = entry.pop("_layout", None)
+            if data is not None:
+                entry["data"] = base64.b64encode(data).decode("ascii")
+            if layout is not None:
+                entry["layout"] = layout
+            yield (json.dumps(entry) + "\n").encode("utf-8")
+    finally:
+        await entries.aclose()
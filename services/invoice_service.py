@@ -1,9 +1,32 @@
 # services/invoice_service.py
+import base64
 import datetime
-from typing import Dict, Any, Union
-from models import InvoiceRequest
+import functools
+import json
+import os
+import time
+from array import array
+from itertools import repeat
+from operator import add, mul, sub, truediv
+from typing import Dict, Any, Iterator, List, Sequence, Tuple, Union
+from encoders import DEFAULT_PROFILE, IMAGE_FORMATS
+from models import InvoiceRequest, LineTotal, ProcessedInvoice
+from services.render_cache import render_cache, cache_key
 
+try:
+    import numpy
+except ImportError:  # optional: batch totals fall back to a pure-Python pass
+    numpy = None
 
+# PDFs of invoices with at least this many line items are streamed page by page
+PDF_STREAM_MIN_ITEMS = int(os.environ.get("PDF_STREAM_MIN_ITEMS", 500))
+
+TOTALS_COLUMNS = ("quantity", "unit_price", "subtotal", "discount",
+                  "discount_amount", "tax_rate", "tax_amount", "total")
+
+
+# Dates repeat heavily across a batch, and strptime/strftime are slow
+@functools.lru_cache(maxsize=4096)
 def format_date(date_str: str) -> str:
     """Format date from YYYY-MM-DD to DD Month YYYY"""
     try:
@@ -23,13 +46,13 @@ def calculate_totals(quantity: Union[str, int, float],
         price = float(unit_price)
         tax = float(tax_rate)
         disc = float(discount)
-        
+
         subtotal = qty * price
         discount_amount = subtotal * (disc / 100)
         subtotal_after_discount = subtotal - discount_amount
         tax_amount = subtotal_after_discount * (tax / 100)
         total = subtotal_after_discount + tax_amount
-        
+
         return {
             "quantity": qty,
             "unit_price": price,
@@ -53,85 +76,288 @@ def calculate_totals(quantity: Union[str, int, float],
         }
 
 
-def process_invoice_data(invoice_data: Union[InvoiceRequest, Dict[str, Any]], 
-                         is_form_data: bool = False) -> Dict[str, Any]:
-    """Process and format invoice data for generation"""
-    if isinstance(invoice_data, InvoiceRequest):
-        # API request
-        invoice_date = invoice_data.invoice_date
-        due_date = invoice_data.due_date
-        is_paid = invoice_data.mark_paid
-        quantity = invoice_data.quantity
-        unit_price = invoice_data.unit_price
-        tax_rate = invoice_data.tax_rate
-        discount = invoice_data.discount
+def _parse_column(values: Sequence, errors: bytearray) -> array:
+    """Convert a column to doubles with float(), flagging rows that fail"""
+    if isinstance(values, array) and values.typecode == "d":
+        return values
+    if numpy is not None and isinstance(values, numpy.ndarray) and values.dtype == numpy.float64:
+        return array("d", values.tobytes())
+    try:
+        return array("d", map(float, values))
+    except Exception:
+        pass
+    out = array("d", bytes(8 * len(errors)))
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except Exception:
+            errors[i] = 1
+    return out
+
+
+def calculate_totals_batch(quantities: Sequence, unit_prices: Sequence,
+                           tax_rates: Sequence, discounts: Sequence) -> Dict[str, Any]:
+    """Columnar calculate_totals for many rows at once.
+
+    Takes equal-length columns (lists of str/int/float, array('d') or
+    float64 NumPy arrays) and returns one array('d') per calculate_totals
+    key, plus "errors", a bytearray that is 1 for rows whose inputs could
+    not be parsed, and "error_count". Every row matches calculate_totals
+    exactly, including all-zero figures for rows that fail to parse.
+    Arithmetic runs vectorized with NumPy when installed, otherwise as
+    C-level map() passes over stdlib arrays.
+    """
+    n = len(quantities)
+    if not (len(unit_prices) == len(tax_rates) == len(discounts) == n):
+        raise ValueError("All columns must have the same length")
+
+    errors = bytearray(n)
+    inputs = [_parse_column(col, errors) for col in (quantities, unit_prices, tax_rates, discounts)]
+    error_count = n - errors.count(0)
+
+    if numpy is not None:
+        bad = numpy.frombuffer(bytes(errors), dtype=numpy.bool_)
+        # Failed rows are zeroed on input, so every output is 0.0 for them
+        q, p, t, d = (numpy.where(bad, 0.0, numpy.frombuffer(col, dtype=numpy.float64))
+                      for col in inputs)
+        with numpy.errstate(all="ignore"):
+            subtotal = q * p
+            discount_amount = subtotal * (d / 100)
+            subtotal_after_discount = subtotal - discount_amount
+            tax_amount = subtotal_after_discount * (t / 100)
+            total = subtotal_after_discount + tax_amount
+        results = (q, p, subtotal, d, discount_amount, t, tax_amount, total)
+        columns = {name: array("d", col.tobytes()) for name, col in zip(TOTALS_COLUMNS, results)}
     else:
-        # Form data
-        invoice_date = invoice_data.get("invoice_date")
-        due_date = invoice_data.get("due_date")
-        is_paid = invoice_data.get("mark_paid") == "yes"
-        quantity = invoice_data.get("quantity", "1")
-        unit_price = invoice_data.get("unit_price")
-        tax_rate = invoice_data.get("tax_rate", "0")
-        discount = invoice_data.get("discount", "0")
-    
-    formatted_invoice_date = format_date(invoice_date)
-    formatted_due_date = format_date(due_date)
-    
-    totals = calculate_totals(quantity, unit_price, tax_rate, discount)
-    
-    if isinstance(invoice_data, InvoiceRequest):
-        processed = {
-            "invoice_no": invoice_data.invoice_no,
-            "invoice_date": formatted_invoice_date,
-            "due_date": formatted_due_date,
-            "payment_terms": invoice_data.payment_terms,
-            "company_name": invoice_data.company_name,
-            "company_address": invoice_data.company_address,
-            "company_tax_id": invoice_data.company_tax_id,
-            "company_email": invoice_data.company_email,
-            "company_phone": invoice_data.company_phone,
-            "client_name": invoice_data.client_name,
-            "client_address": invoice_data.client_address,
-            "client_email": invoice_data.client_email,
-            "client_phone": invoice_data.client_phone,
-            "currency": invoice_data.currency,
-            "payment_method": invoice_data.payment_method,
-            "item_description": invoice_data.item_description,
-            "notes": invoice_data.notes,
-            "is_paid": is_paid
-        }
+        if error_count:
+            inputs = [array("d", col) for col in inputs]
+            for i in range(n):
+                if errors[i]:
+                    for col in inputs:
+                        col[i] = 0.0
+        q, p, t, d = inputs
+        subtotal = array("d", map(mul, q, p))
+        discount_amount = array("d", map(mul, subtotal, map(truediv, d, repeat(100.0, n))))
+        subtotal_after_discount = array("d", map(sub, subtotal, discount_amount))
+        tax_amount = array("d", map(mul, subtotal_after_discount, map(truediv, t, repeat(100.0, n))))
+        total = array("d", map(add, subtotal_after_discount, tax_amount))
+        results = (q, p, subtotal, d, discount_amount, t, tax_amount, total)
+        columns = dict(zip(TOTALS_COLUMNS, results))
+
+    columns["errors"] = errors
+    columns["error_count"] = error_count
+    return columns
+
+
+def _line_totals(line_items: List[Tuple[str, Any, Any]], tax_rate: Union[str, int, float],
+                 discount: Union[str, int, float]) -> Tuple[Tuple[LineTotal, ...], tuple]:
+    """Return (rows, figures): the parsed rows and the TOTALS_COLUMNS values in order."""
+    try:
+        tax = float(tax_rate)
+        disc = float(discount)
+        rows = []
+        for description, quantity, unit_price in line_items:
+            qty = float(quantity)
+            price = float(unit_price)
+            rows.append(LineTotal(description, qty, price, qty * price))
+    except:
+        return (tuple(LineTotal(description, 0, 0, 0) for description, _, _ in line_items),
+                (0, 0, 0, 0, 0, 0, 0, 0))
+
+    subtotal = sum([row.amount for row in rows[1:]], rows[0].amount) if rows else 0.0
+    discount_amount = subtotal * (disc / 100)
+    subtotal_after_discount = subtotal - discount_amount
+    tax_amount = subtotal_after_discount * (tax / 100)
+    total = subtotal_after_discount + tax_amount
+
+    quantity, unit_price = (rows[0].quantity, rows[0].unit_price) if rows else (0.0, 0.0)
+    return tuple(rows), (quantity, unit_price, subtotal, disc, discount_amount, tax,
+                         tax_amount, total)
+
+
+def calculate_line_totals(line_items: List[Tuple[str, Any, Any]],
+                          tax_rate: Union[str, int, float],
+                          discount: Union[str, int, float]) -> Dict[str, Any]:
+    """Calculate invoice totals over all (description, quantity, unit_price) rows.
+
+    Returns the calculate_totals keys (quantity and unit_price are those of
+    the first row) plus "line_items", the parsed rows with their amounts.
+    A single row gives exactly the same figures as calculate_totals.
+    """
+    rows, figures = _line_totals(line_items, tax_rate, discount)
+    totals = dict(zip(TOTALS_COLUMNS, figures))
+    totals["line_items"] = [row._asdict() for row in rows]
+    return totals
+
+
+def _processed_invoice(invoice_no, invoice_date, due_date, payment_terms, company_name,
+                       company_address, company_tax_id, company_email, company_phone,
+                       client_name, client_address, client_email, client_phone, currency,
+                       payment_method, notes, is_paid, stamp, line_items, tax_rate,
+                       discount) -> ProcessedInvoice:
+    rows, figures = _line_totals(line_items, tax_rate, discount)
+    return ProcessedInvoice(
+        invoice_no, format_date(invoice_date), format_date(due_date), payment_terms,
+        company_name, company_address, company_tax_id, company_email, company_phone,
+        client_name, client_address, client_email, client_phone, currency, payment_method,
+        line_items[0][0], notes, is_paid, stamp, *figures, rows,
+    )
+
+
+def processed_from_request(invoice: InvoiceRequest) -> ProcessedInvoice:
+    """Adapter for API requests"""
+    if invoice.line_items:
+        line_items = [(item.description, item.quantity, item.unit_price)
+                      for item in invoice.line_items]
     else:
-        processed = {
-            "invoice_no": invoice_data.get("invoice_no"),
-            "invoice_date": formatted_invoice_date,
-            "due_date": formatted_due_date,
-            "payment_terms": invoice_data.get("payment_terms", "Net 30"),
-            "company_name": invoice_data.get("company_name"),
-            "company_address": invoice_data.get("company_address"),
-            "company_tax_id": invoice_data.get("company_tax_id", ""),
-            "company_email": invoice_data.get("company_email", ""),
-            "company_phone": invoice_data.get("company_phone", ""),
-            "client_name": invoice_data.get("client_name"),
-            "client_address": invoice_data.get("client_address"),
-            "client_email": invoice_data.get("client_email", ""),
-            "client_phone": invoice_data.get("client_phone", ""),
-            "currency": invoice_data.get("currency"),
-            "payment_method": invoice_data.get("payment_method", "Bank Transfer"),
-            "item_description": invoice_data.get("item_description"),
-            "notes": invoice_data.get("notes", ""),
-            "is_paid": is_paid
-        }
-    
-    processed.update(totals)
-    return processed
+        line_items = [(invoice.item_description, invoice.quantity, invoice.unit_price)]
+    return _processed_invoice(
+        invoice.invoice_no, invoice.invoice_date, invoice.due_date, invoice.payment_terms,
+        invoice.company_name, invoice.company_address, invoice.company_tax_id,
+        invoice.company_email, invoice.company_phone, invoice.client_name,
+        invoice.client_address, invoice.client_email, invoice.client_phone, invoice.currency,
+        invoice.payment_method, invoice.notes, invoice.mark_paid, invoice.stamp,
+        line_items, invoice.tax_rate, invoice.discount,
+    )
+
+
+def processed_from_form(form: Dict[str, Any]) -> ProcessedInvoice:
+    """Adapter for HTML form submissions and other plain dicts of form fields"""
+    get = form.get
+    return _processed_invoice(
+        get("invoice_no"), get("invoice_date"), get("due_date"), get("payment_terms", "Net 30"),
+        get("company_name"), get("company_address"), get("company_tax_id", ""),
+        get("company_email", ""), get("company_phone", ""), get("client_name"),
+        get("client_address"), get("client_email", ""), get("client_phone", ""),
+        get("currency"), get("payment_method", "Bank Transfer"), get("notes", ""),
+        get("mark_paid") == "yes", get("stamp", ""),
+        [(get("item_description"), get("quantity", "1"), get("unit_price"))],
+        get("tax_rate", "0"), get("discount", "0"),
+    )
+
+
+def process_invoice_data(invoice_data: Union[InvoiceRequest, Dict[str, Any]]) -> ProcessedInvoice:
+    """Process and format invoice data for generation; dicts are form fields"""
+    if isinstance(invoice_data, InvoiceRequest):
+        return processed_from_request(invoice_data)
+    return processed_from_form(invoice_data)
 
 
-def generate_invoice_bytes(processed_data: Dict[str, Any], format: str) -> bytes:
-    """Generate invoice as PDF or PNG bytes"""
+def output_file_info(format: str) -> Tuple[str, str]:
+    """Return (file extension, media type) for an output format"""
+    if format == "pdf":
+        return "pdf", "application/pdf"
+    _, media_type, ext = IMAGE_FORMATS.get(format, IMAGE_FORMATS["png"])
+    return ext, media_type
+
+
+def layout_body(data: bytes, layout: Dict[str, Any], format: str) -> bytes:
+    """JSON body carrying a rendered image (base64) and its field layout"""
+    _, media_type = output_file_info(format)
+    return json.dumps({"media_type": media_type,
+                       "data": base64.b64encode(data).decode("ascii"),
+                       "layout": layout}).encode("utf-8")
+
+
+def generate_invoice_bytes(processed_data: ProcessedInvoice, format: str,
+                           profile: str = DEFAULT_PROFILE) -> bytes:
+    """Generate invoice as PDF or image (PNG/WebP/JPEG) bytes"""
     if format == "pdf":
         from imagegen import draw_invoice_pdf_bytes
         return draw_invoice_pdf_bytes(processed_data)
     else:
         from imagegen import draw_invoice_png_bytes
-        return draw_invoice_png_bytes(processed_data)
+        image_format = format if format in IMAGE_FORMATS else "png"
+        return draw_invoice_png_bytes(processed_data, profile=profile,
+                                      image_format=image_format)
+
+
+def should_stream_pdf(processed_data: ProcessedInvoice, format: str) -> bool:
+    """Whether an invoice is large enough to be sent as a streamed PDF"""
+    return format == "pdf" and len(processed_data.line_items) >= PDF_STREAM_MIN_ITEMS
+
+
+def iter_invoice_pdf(processed_data: ProcessedInvoice) -> Iterator[bytes]:
+    """Generate an invoice PDF page by page; memory is bounded by one page"""
+    from imagegen import iter_invoice_pdf_chunks
+    return iter_invoice_pdf_chunks(processed_data)
+
+
+def generate_invoice_with_layout(processed_data: ProcessedInvoice, format: str,
+                                 profile: str = DEFAULT_PROFILE) -> Tuple[bytes, Dict[str, Any]]:
+    """Render a raster invoice and return (image bytes, field layout dict)"""
+    from imagegen import draw_invoice_png_bytes
+    from layout_capture import LayoutCapture
+    layout = LayoutCapture()
+    image_format = format if format in IMAGE_FORMATS else "png"
+    data = draw_invoice_png_bytes(processed_data, profile=profile, image_format=image_format,
+                                  layout=layout)
+    return data, layout.to_dict()
+
+
+def generate_invoice_bytes_cached(processed_data: ProcessedInvoice, format: str,
+                                  profile: str = DEFAULT_PROFILE) -> bytes:
+    """Like generate_invoice_bytes, but served from the render cache when possible"""
+    key = cache_key(processed_data, format, profile)
+    invoice_bytes = render_cache.get(key)
+    if invoice_bytes is None:
+        invoice_bytes = generate_invoice_bytes(processed_data, format, profile)
+        render_cache.put(key, invoice_bytes)
+    return invoice_bytes
+
+
+# Throwaway invoice used to warm fonts, base layers and reportlab metrics
+WARMUP_INVOICE = {
+    "invoice_no": "WARMUP-1",
+    "invoice_date": "2025-01-01",
+    "due_date": "2025-01-31",
+    "company_name": "Warmup Ltd.",
+    "company_address": "1 Warmup Street\nCity",
+    "client_name": "Warmup Client",
+    "client_address": "2 Warmup Avenue\nCity",
+    "currency": "USD",
+    "item_description": "Warmup",
+    "unit_price": "1.00",
+    "tax_rate": "1",
+    "discount": "1",
+    "notes": "Warmup",
+}
+
+
+def warm_up_renderers() -> Dict[str, float]:
+    """Import the renderers, load fonts and render throwaway documents in each format.
+
+    Run at application startup and as the initializer of render worker
+    processes, so that the first real request does not pay for imports,
+    font parsing and reportlab font metrics. Returns seconds per stage.
+    """
+    timings = {}
+    last = time.perf_counter()
+
+    def lap(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round(now - last, 4)
+        last = now
+
+    import imagegen, pdfstream  # noqa: F401
+    from services import receipt_service
+    lap("import")
+
+    import fonts
+    from layout_spec import get_plan
+    for font in (fonts.font_sm, fonts.font_body, fonts.font_h1, fonts.font_bold):
+        font()
+    get_plan("receipt")
+    lap("fonts")
+
+    invoices = [process_invoice_data(dict(WARMUP_INVOICE, mark_paid=is_paid))
+                for is_paid in ("", "yes")]
+    for format in ("pdf",) + tuple(IMAGE_FORMATS):
+        for processed in invoices:
+            generate_invoice_bytes(processed, format)
+        lap(format)
+
+    receipt_service.warm_up_receipts()
+    lap("receipt")
+    return timings
@@ -0,0 +1,303 @@
+# services/job_queue.py
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from services.batch_service import render_item
+from services.invoice_service import layout_body
+
+# Defaults to the app directory, not the working directory the server was started from
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH",
+                                str(Path(__file__).resolve().parent.parent / "jobs.db"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 2))
+# Seconds a finished job and its result are kept
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 3600))
+# A job that was running during this many restarts is failed instead of retried
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# How often idle workers look for jobs in the store and expired jobs are purged
+JOB_POLL_INTERVAL = 1.0
+JOB_PURGE_INTERVAL = 60.0
+
+logger = logging.getLogger("uvicorn.error")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL,
+    error TEXT,
+    filename TEXT,
+    media_type TEXT,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires);
+"""
+
+_META_COLUMNS = ("id", "kind", "status", "attempts", "created", "started", "finished",
+                 "expires", "error", "filename", "media_type", "size")
+
+
+def _timestamp(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat(
+        timespec="seconds")
+
+
+class JobStore:
+    """Render jobs in a local SQLite database, so they survive restarts.
+
+    Jobs go queued -> running -> done or failed. Finished jobs keep their
+    result until ``expires`` and are then purged.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def create(self, kind: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), time.time()))
+        return job_id
+
+    def claim(self) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Mark the oldest queued job running; returns (id, kind, payload) or None."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, kind, payload FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1 "
+                        "WHERE id = ?", (time.time(), row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def finish(self, job_id: str, result: bytes, filename: str, media_type: str,
+               ttl: float = JOB_RESULT_TTL):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', finished = ?, expires = ?, result = ?, "
+                "filename = ?, media_type = ? WHERE id = ?",
+                (now, now + ttl, result, filename, media_type, job_id))
+
+    def fail(self, job_id: str, error: str, ttl: float = JOB_RESULT_TTL):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, expires = ?, error = ? "
+                "WHERE id = ?", (now, now + ttl, error, job_id))
+
+    def recover(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """Requeue jobs left running by a previous process; returns how many."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, expires = ?, "
+                "error = 'Render interrupted too many times' "
+                "WHERE status = 'running' AND attempts >= ?",
+                (now, now + JOB_RESULT_TTL, max_attempts))
+            return self._db.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL "
+                "WHERE status = 'running'").rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM jobs WHERE expires < ?",
+                                    (time.time(),)).rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's status without its result; None if unknown or expired."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_META_COLUMNS[:-1])}, length(result) FROM jobs "
+                "WHERE id = ? AND (expires IS NULL OR expires >= ?)",
+                (job_id, time.time())).fetchone()
+        return dict(zip(_META_COLUMNS, row)) if row is not None else None
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = 'done' AND expires >= ?",
+                (job_id, time.time())).fetchone()
+        return row[0] if row is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The public view of a job, as returned by the /api/jobs endpoints."""
+    status = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": _timestamp(job["created"]),
+        "started_at": _timestamp(job["started"]),
+        "finished_at": _timestamp(job["finished"]),
+        "expires_at": _timestamp(job["expires"]),
+        "status_url": f"/api/jobs/{job['id']}",
+    }
+    if job["status"] == "done":
+        status.update(result_url=f"/api/jobs/{job['id']}/result", filename=job["filename"],
+                      media_type=job["media_type"], bytes=job["size"])
+    elif job["status"] == "failed":
+        status["error"] = job["error"]
+    return status
+
+
+class JobQueue:
+    """Background workers rendering the jobs in a JobStore.
+
+    Renders go through the shared render executor, as batch items do, so
+    jobs and direct requests share its capacity. Submitting wakes an idle
+    worker; workers also poll the store, picking up jobs left over from
+    before a restart. The store is only used from one dedicated thread,
+    so reading and writing result blobs never blocks the event loop.
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH, workers: int = JOB_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._store = None
+        self._db_thread = None
+        self._tasks = []
+        self._wakeup = None
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def store(self) -> JobStore:
+        # Opened on first use, so importing the app does not create the database.
+        # Only call from the store thread; coroutines go through _call.
+        if self._store is None:
+            self._store = JobStore(self.path)
+        return self._store
+
+    async def _call(self, method: str, *args):
+        """Run a JobStore method on the store thread and await its result."""
+        if self._db_thread is None:
+            self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_thread, lambda: getattr(self.store, method)(*args))
+
+    async def start(self):
+        """Recover interrupted jobs, then start the workers."""
+        recovered = await self._call("recover")
+        if recovered:
+            logger.info("Requeued %d interrupted render job(s)", recovered)
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._purge()))
+
+    async def stop(self):
+        """Stop the workers. Jobs they were rendering are requeued on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._db_thread is not None:
+            if self._store is not None:
+                await self._call("close")
+                self._store = None
+            self._db_thread.shutdown(wait=True)
+            self._db_thread = None
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = await self._call("create", kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return await self._call("get", job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's status without its result; None if unknown or expired."""
+        return await self._call("get", job_id)
+
+    async def result(self, job_id: str) -> Optional[bytes]:
+        """A finished job's document; None if not done, unknown or expired."""
+        return await self._call("result", job_id)
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            claimed = await self._call("claim")
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(*claimed)
+            except Exception as e:
+                logger.exception("Render job %s failed", claimed[0])
+                self.failed += 1
+                await self._call("fail", claimed[0], f"Error generating {claimed[1]}: {str(e)}")
+
+    async def _run(self, job_id: str, kind: str, payload: Dict[str, Any]):
+        entry = await render_item(0, payload, kind)
+        if entry["status"] != "ok":
+            self.failed += 1
+            await self._call("fail", job_id, entry["error"])
+            return
+        data = entry["_data"]
+        layout = entry.get("_layout")
+        filename, media_type = entry["filename"].split("_", 1)[1], entry["media_type"]
+        if layout is not None:
+            data = layout_body(data, layout, payload["format"])
+            filename, media_type = filename.rsplit(".", 1)[0] + ".json", "application/json"
+        await self._call("finish", job_id, data, filename, media_type)
+        self.completed += 1
+
+    async def _purge(self):
+        while True:
+            await asyncio.sleep(JOB_PURGE_INTERVAL)
+            await self._call("purge_expired")
+
+    async def stats(self) -> dict:
+        stats = {"workers": self.workers, "running": bool(self._tasks),
+                 "completed": self.completed, "failed": self.failed}
+        if self._store is not None:
+            stats["jobs"] = await self._call("counts")
+        return stats
+
+
+job_queue = JobQueue()
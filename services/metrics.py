@@ -0,0 +1,157 @@
+# services/metrics.py
+"""Prometheus metrics for rendering, exposed in the text format at /metrics.
+
+Counters and histograms are kept in-process and rendered on scrape, so
+no client library is needed. With a process render executor, stage
+timings come back from the workers with each result (see timing.py)
+and are recorded here, in the web process.
+"""
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from timing import StageTimer
+
+PREFIX = "invoicegen_"
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    labels = _label_text(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _label_text(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_number(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "stage_seconds", "Seconds spent per request stage of a document render.",
+    ("document", "format", "paid", "stage"))
+RENDER_ERRORS = Counter(
+    "render_errors_total", "Renders that failed, by reason (error or queue_full).",
+    ("document", "format", "reason"))
+OUTPUT_BYTES = Counter(
+    "output_bytes_total", "Bytes of rendered documents sent or archived.",
+    ("document", "format"))
+QUEUE_WAIT_SECONDS = Histogram(
+    "render_queue_wait_seconds", "Seconds renders waited in their priority lane for a worker.",
+    ("lane",))
+
+METRICS = (STAGE_SECONDS, RENDER_ERRORS, OUTPUT_BYTES, QUEUE_WAIT_SECONDS)
+
+
+def document_labels(document: str, format: str, processed_data: Any) -> Dict[str, str]:
+    """Labels for one render: the document kind, output format and paid status.
+
+    ``processed_data`` is a ProcessedInvoice or a processed receipt dict.
+    """
+    if isinstance(processed_data, dict):
+        paid = bool(processed_data.get("is_paid")) or processed_data.get("stamp") == "PAID"
+    else:
+        paid = bool(processed_data.is_paid) or processed_data.stamp == "PAID"
+    return {"document": document, "format": format, "paid": "true" if paid else "false"}
+
+
+def observe_stages(timer: StageTimer):
+    """Record every stage of a finished request that set its labels."""
+    if timer.labels is None:
+        return
+    for stage, seconds in timer.stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, **timer.labels)
+
+
+def count_output(document: str, format: str, size: int):
+    OUTPUT_BYTES.inc(size, document=document, format=format)
+
+
+def count_error(document: str, format: str, reason: str = "error"):
+    RENDER_ERRORS.inc(document=document, format=format, reason=reason)
+
+
+def observe_queue_wait(lane: str, seconds: float):
+    QUEUE_WAIT_SECONDS.observe(seconds, lane=lane)
+
+
+def render_metrics(extra: Optional[Iterable[Tuple[str, str, str, Any]]] = None) -> str:
+    """All metrics in the Prometheus text format.
+
+    ``extra`` adds values read at scrape time as (name, type, help, value),
+    where value is a number or a list of (labels, number) pairs.
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, kind, help, value in extra or ():
+        lines += [f"# HELP {PREFIX}{name} {help}", f"# TYPE {PREFIX}{name} {kind}"]
+        if isinstance(value, list):
+            lines += [f"{PREFIX}{name}{_label_text(list(labels), list(labels.values()))} "
+                      f"{_number(v)}" for labels, v in value]
+        else:
+            lines.append(f"{PREFIX}{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
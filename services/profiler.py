@@ -0,0 +1,69 @@
+# services/profiler.py
+import itertools
+import os
+import threading
+from typing import Dict, Optional
+
+# Profile one in every PROFILE_SAMPLE_RATE renders; 0 (the default) disables profiling
+PROFILE_SAMPLE_RATE = int(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+
+
+class Profiler:
+    """Opt-in sampling profiler for live renders.
+
+    One in every ``sample_rate`` renders run through
+    ``render_executor.run_timed`` has its stack sampled (see profiling.py),
+    and the counts are aggregated here per endpoint for /admin/profile.
+    Disabled, the render path only checks ``enabled``, and the sampling
+    module is never imported.
+    """
+
+    def __init__(self, sample_rate: int = PROFILE_SAMPLE_RATE,
+                 interval_ms: float = PROFILE_INTERVAL_MS):
+        self.enabled = sample_rate > 0
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stacks: Dict[str, Dict[str, int]] = {}
+        self._profiles: Dict[str, int] = {}
+
+    def should_sample(self) -> bool:
+        return self.enabled and next(self._counter) % self.sample_rate == 0
+
+    def record(self, endpoint: str, stacks: Dict[str, int]):
+        with self._lock:
+            merged = self._stacks.setdefault(endpoint, {})
+            for stack, count in stacks.items():
+                merged[stack] = merged.get(stack, 0) + count
+            self._profiles[endpoint] = self._profiles.get(endpoint, 0) + 1
+
+    def collapsed(self, endpoint: Optional[str] = None) -> str:
+        """Aggregated samples as collapsed stacks, rooted at their endpoint."""
+        lines = []
+        with self._lock:
+            for name, stacks in sorted(self._stacks.items()):
+                if endpoint is not None and name != endpoint:
+                    continue
+                for stack, count in sorted(stacks.items()):
+                    lines.append(f"{name};{stack} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
+            self._profiles.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "interval_ms": self.interval * 1000,
+                "profiles": dict(self._profiles),
+                "samples": {name: sum(stacks.values()) for name, stacks in self._stacks.items()},
+            }
+
+
+profiler = Profiler()
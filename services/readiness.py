@@ -0,0 +1,57 @@
+# services/readiness.py
+import asyncio
+import logging
+import os
+import time
+
+from services.invoice_service import warm_up_renderers
+from services.render_executor import render_executor
+
+# Set STARTUP_WARMUP=0 to skip rendering throwaway documents at startup (e.g. in development)
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "1") != "0"
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class Readiness:
+    """Startup warm-up state: the app reports ready only once it has finished.
+
+    Warm-up runs in the background so the server binds its port and
+    answers liveness checks (/api/health) right away, while readiness
+    checks (/api/ready) fail until renderers are imported and warm.
+    """
+
+    def __init__(self, warm_up: bool = STARTUP_WARMUP):
+        self.warm_up = warm_up
+        self.ready = False
+        self.error = None
+        self.timings = {}
+        self._task = None
+
+    def start(self):
+        """Begin warming up; call from a startup hook, inside the event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            # Spawning and warming process workers blocks, so keep it off the loop
+            await loop.run_in_executor(None, render_executor.start)
+            self.timings["render_executor"] = round(time.perf_counter() - started, 4)
+            if self.warm_up:
+                self.timings.update(await loop.run_in_executor(None, warm_up_renderers))
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Startup warm-up failed")
+            return
+        self.timings["total"] = round(time.perf_counter() - started, 4)
+        self.ready = True
+        logger.info("Renderers warm in %.2fs: %s", self.timings["total"],
+                    ", ".join(f"{k}={v:.3f}s" for k, v in self.timings.items() if k != "total"))
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "error": self.error, "timings": dict(self.timings)}
+
+
+readiness = Readiness()
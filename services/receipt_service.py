@@ -0,0 +1,79 @@
+# services/receipt_service.py
+from typing import Any, Dict, Tuple
+
+from encoders import DEFAULT_PROFILE, IMAGE_FORMATS
+from layout_spec import template_digest
+from models import ReceiptRequest
+from services.invoice_service import format_date
+
+# Processed keys that are not renderer arguments
+META_KEYS = ("document", "template_digest")
+
+
+def process_receipt_data(receipt_data: ReceiptRequest) -> Dict[str, Any]:
+    """Process and format receipt data for generation"""
+    return {
+        # Keeps receipt cache keys apart from invoice ones
+        "document": "receipt",
+        "company_name": receipt_data.company_name,
+        "receipt_no": receipt_data.receipt_no,
+        "received_from": receipt_data.received_from,
+        "receipt_date": format_date(receipt_data.receipt_date),
+        "currency": receipt_data.currency,
+        "totalsum": str(receipt_data.total_sum),
+        "description": receipt_data.description,
+        "stamp": receipt_data.stamp,
+        "template": receipt_data.template,
+        # Edited templates must not be served from stale cache entries
+        "template_digest": template_digest(receipt_data.template),
+    }
+
+
+def _draw_args(processed_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in processed_data.items() if k not in META_KEYS}
+
+
+def generate_receipt_bytes(processed_data: Dict[str, Any], format: str,
+                           profile: str = DEFAULT_PROFILE) -> bytes:
+    """Generate receipt as PDF or image (PNG/WebP/JPEG) bytes"""
+    fields = _draw_args(processed_data)
+    if format == "pdf":
+        from receipt_pdf import draw_receipt_pdf_bytes
+        return draw_receipt_pdf_bytes(**fields)
+    else:
+        from receipt_png import draw_receipt_png_bytes
+        image_format = format if format in IMAGE_FORMATS else "png"
+        return draw_receipt_png_bytes(**fields, profile=profile, image_format=image_format)
+
+
+def generate_receipt_with_layout(processed_data: Dict[str, Any], format: str,
+                                 profile: str = DEFAULT_PROFILE) -> Tuple[bytes, Dict[str, Any]]:
+    """Render a raster receipt and return (image bytes, field layout dict)"""
+    from receipt_png import draw_receipt_png_bytes
+    from layout_capture import LayoutCapture
+    layout = LayoutCapture()
+    fields = _draw_args(processed_data)
+    image_format = format if format in IMAGE_FORMATS else "png"
+    data = draw_receipt_png_bytes(**fields, profile=profile, image_format=image_format,
+                                  layout=layout)
+    return data, layout.to_dict()
+
+
+# Throwaway receipt used by warm_up_renderers
+WARMUP_RECEIPT = {
+    "receipt_no": "WARMUP-1",
+    "receipt_date": "2025-01-01",
+    "company_name": "Warmup Ltd.",
+    "received_from": "Warmup Client",
+    "currency": "USD",
+    "total_sum": "1.00",
+    "description": "Warmup",
+    "stamp": "PAID",
+}
+
+
+def warm_up_receipts():
+    """Render a throwaway receipt as PDF and PNG, compiling its template."""
+    processed = process_receipt_data(ReceiptRequest.model_validate(WARMUP_RECEIPT))
+    for format in ("pdf", "png"):
+        generate_receipt_bytes(processed, format)
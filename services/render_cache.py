@@ -0,0 +1,201 @@
+# services/render_cache.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from imagegen import INVOICE_TEMPLATE
+from layout_spec import template_digest
+from models import ProcessedInvoice
+
+# Bump whenever renderer output changes so stale entries are never served
+RENDERER_VERSION = "4"
+
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", "")
+RENDER_CACHE_DISK_MAX_BYTES = int(os.environ.get("RENDER_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024))
+
+
+def cache_key(processed_data: Union[ProcessedInvoice, Dict[str, Any]], format: str, profile: str,
+              variant: str = "") -> str:
+    """Stable content hash of a processed invoice plus its output settings.
+
+    ``variant`` separates other representations of the same render, such
+    as the image-plus-layout JSON body.
+    """
+    key = {"data": processed_data, "format": format, "profile": profile,
+           "renderer": RENDERER_VERSION}
+    if isinstance(processed_data, ProcessedInvoice):
+        key["data"] = processed_data.as_dict()
+        # Edited templates must not be served from stale cache entries
+        key["template_digest"] = template_digest(INVOICE_TEMPLATE)
+    if variant:
+        key["variant"] = variant
+    canonical = json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Content-addressed cache of rendered documents.
+
+    An in-memory LRU bounded by total bytes sits in front of an optional
+    on-disk tier (one file per key) that survives restarts. The disk tier
+    is an LRU too, bounded by ``disk_max_bytes``; its writes, evictions
+    and recency updates run on one background thread, so ``put`` never
+    waits for the disk.
+    """
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES,
+                 directory: Optional[str] = RENDER_CACHE_DIR or None,
+                 disk_max_bytes: int = RENDER_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Disk index, key -> size, least recently used first. Only the writer
+        # thread touches it; it is loaded from the directory on first use.
+        self._disk = None
+        self._disk_size = 0
+        self._writer = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _remember(self, key: str, value: bytes):
+        # Caller holds the lock
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.bytes_saved += len(value)
+                return value
+
+        if self.directory is not None:
+            try:
+                value = self._path(key).read_bytes()
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self.bytes_saved += len(value)
+                self._background(self._touch, key)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            self._remember(key, value)
+        if self.directory is not None and len(value) <= self.disk_max_bytes:
+            self._background(self._write, key, value)
+
+    def flush(self):
+        """Wait until every queued disk write has finished."""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def _background(self, fn, *args):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1,
+                                                      thread_name_prefix="render-cache")
+        self._writer.submit(fn, *args)
+
+    # ---- disk tier; the methods below run on the writer thread only ----
+
+    def _disk_index(self) -> OrderedDict:
+        if self._disk is None:
+            found = []
+            for path in self.directory.glob("*/*"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if path.name.endswith(".tmp"):
+                    path.unlink(missing_ok=True)    # left by a crash mid-write
+                else:
+                    found.append((stat.st_mtime, path.name, stat.st_size))
+            self._disk = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._disk_size = sum(self._disk.values())
+        return self._disk
+
+    def _write(self, key: str, value: bytes):
+        index = self._disk_index()
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+            tmp.write_bytes(value)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_size -= index.pop(key, 0)
+        index[key] = len(value)
+        self._disk_size += len(value)
+        while self._disk_size > self.disk_max_bytes:
+            evicted, size = index.popitem(last=False)
+            self._disk_size -= size
+            self._path(evicted).unlink(missing_ok=True)
+
+    def _touch(self, key: str):
+        index = self._disk_index()
+        if key in index:
+            index.move_to_end(key)
+            try:
+                os.utime(self._path(key))     # keeps the order across restarts
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk": str(self.directory) if self.directory else None,
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+render_cache = RenderCache()
@@ -0,0 +1,366 @@
+# services/render_executor.py
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Optional
+
+from services.metrics import observe_queue_wait
+from services.profiler import profiler
+from timing import current_timer, run_timed
+
+# Settings come from the environment, like API_SECRET_KEY in config.py
+RENDER_EXECUTOR = os.environ.get("RENDER_EXECUTOR", "thread")   # "thread" or "process"
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 2))
+RENDER_QUEUE_SIZE = int(os.environ.get("RENDER_QUEUE_SIZE", 32))
+RENDER_RETRY_AFTER = int(os.environ.get("RENDER_RETRY_AFTER", 2))
+
+
+# Priority lanes, most urgent first: the HTML form, API clients, batches and jobs
+LANES = ("interactive", "api", "bulk")
+DEFAULT_LANE = "api"
+
+
+def _lane_setting(name: str, defaults: dict) -> dict:
+    """Per-lane integers from an env var such as RENDER_LANE_WEIGHTS="interactive:8,bulk:1"."""
+    values = dict(defaults)
+    for part in os.environ.get(name, "").split(","):
+        if part.strip():
+            lane, _, value = part.partition(":")
+            if lane.strip() not in LANES:
+                raise ValueError(f"Unknown render lane {lane.strip()!r} in {name}")
+            values[lane.strip()] = int(value)
+    return values
+
+
+# Share of the workers each backlogged lane gets
+RENDER_LANE_WEIGHTS = _lane_setting("RENDER_LANE_WEIGHTS", {"interactive": 8, "api": 2, "bulk": 1})
+# Caps on renders running per lane, and on renders waiting per lane before
+# RenderQueueFull; lanes not listed default to the workers and RENDER_QUEUE_SIZE
+RENDER_LANE_WORKERS = _lane_setting("RENDER_LANE_WORKERS", {})
+RENDER_LANE_QUEUE = _lane_setting("RENDER_LANE_QUEUE", {})
+
+
+_END = object()
+
+
+def _noop():
+    return None
+
+
+def _release_unused(reservation: Future):
+    # A slot granted to a stream that was cancelled before it could start
+    if not reservation.cancelled() and reservation.exception() is None:
+        reservation.result()()
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slot for a new job."""
+
+
+class _Lane:
+    def __init__(self, name: str, weight: int, max_running: int, max_queued: int):
+        self.name = name
+        self.weight = weight
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.queue = deque()    # (future, fn, args, kwargs, queued at)
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.vtime = 0.0        # virtual time of the lane's next dispatch
+
+    def stats(self) -> dict:
+        return {"weight": self.weight, "max_running": self.max_running,
+                "max_queued": self.max_queued, "running": self.running,
+                "queued": len(self.queue), "completed": self.completed,
+                "rejected": self.rejected}
+
+
+class RenderExecutor:
+    """Dedicated pool for CPU-bound rendering, scheduling renders by priority lane.
+
+    Every render goes through a lane: ``interactive`` for the HTML form,
+    ``api`` for API requests and ``bulk`` for batches and jobs. Renders
+    wait in their lane until a worker is free, and the next lane is picked
+    by weighted fair queuing, so a backlogged lane gets a share of the
+    workers in proportion to its weight. A lane also never runs more than
+    its ``max_running`` renders. Past ``max_queued`` waiting renders,
+    ``submit`` fails fast with RenderQueueFull instead of queueing.
+    """
+
+    def __init__(self, kind: str = RENDER_EXECUTOR, workers: int = RENDER_WORKERS,
+                 queue_size: int = RENDER_QUEUE_SIZE, weights: Optional[dict] = None,
+                 max_running: Optional[dict] = None, max_queued: Optional[dict] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown render executor {kind!r}; expected 'thread' or 'process'")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        weights = {**RENDER_LANE_WEIGHTS, **(weights or {})}
+        max_running = {**RENDER_LANE_WORKERS, **(max_running or {})}
+        max_queued = {**RENDER_LANE_QUEUE, **(max_queued or {})}
+        self.lanes = {name: _Lane(name, weights[name], max_running.get(name, workers),
+                                  max_queued.get(name, queue_size))
+                      for name in LANES}
+        self.capacity = workers + sum(lane.max_queued for lane in self.lanes.values())
+        self._pool = None
+        self._threads = None
+        # Reentrant: a render that finishes at once runs its callback inside dispatch
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._running = 0
+        self._vtime = 0.0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == "process":
+                        # Workers are spawned clean and warm their renderers
+                        # once, then take plain dicts and return bytes
+                        from services.invoice_service import warm_up_renderers
+                        self._pool = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=warm_up_renderers,
+                        )
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="render")
+        return self._pool
+
+    @property
+    def threads(self):
+        """Local threads for work holding a slot that cannot leave this process.
+
+        In thread mode these are the pool's own threads.
+        """
+        if self.kind == "thread":
+            return self.pool
+        if self._threads is None:
+            with self._lock:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(max_workers=self.workers,
+                                                       thread_name_prefix="render")
+        return self._threads
+
+    def start(self):
+        """Create the pool and, for processes, spawn and warm every worker now."""
+        pool = self.pool
+        if self.kind == "process":
+            wait([pool.submit(_noop) for _ in range(self.workers)])
+
+    def submit(self, fn, *args, lane: str = DEFAULT_LANE, **kwargs):
+        """Queue a render in ``lane``, returning a concurrent.futures.Future.
+
+        With ``fn`` None nothing is run: the future's result is a function
+        that gives the slot back, which the caller must call exactly once.
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown render lane {lane!r}; expected one of {LANES}")
+        lane = self.lanes[lane]
+        future = Future()
+        with self._lock:
+            if not lane.queue and not lane.running:
+                # An idle lane rejoins at the current virtual time, without credit
+                lane.vtime = max(lane.vtime, self._vtime)
+            lane.queue.append((future, fn, args, kwargs, time.perf_counter()))
+            self._pending += 1
+            self._dispatch()
+            if len(lane.queue) > lane.max_queued:
+                lane.queue.pop()
+                self._pending -= 1
+                lane.rejected += 1
+                self.rejected += 1
+                raise RenderQueueFull(
+                    f"Render queue is full ({len(lane.queue)} {lane.name} renders waiting)"
+                )
+        return future
+
+    def _next_lane(self) -> Optional[_Lane]:
+        # Caller holds the lock
+        ready = [lane for lane in self.lanes.values()
+                 if lane.queue and lane.running < lane.max_running]
+        if not ready:
+            return None
+        # Lowest virtual time first; ties go to the more urgent lane
+        return min(ready, key=lambda lane: lane.vtime)
+
+    def _dispatch(self):
+        """Start waiting renders while workers are free. Caller holds the lock."""
+        while self._running < self.workers:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            future, fn, args, kwargs, queued_at = lane.queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                self._pending -= 1      # cancelled while waiting, e.g. the client went away
+                continue
+            self._vtime = lane.vtime
+            lane.vtime += 1 / lane.weight
+            lane.running += 1
+            self._running += 1
+            observe_queue_wait(lane.name, time.perf_counter() - queued_at)
+            if fn is None:
+                # A reserved slot, held until the caller releases it
+                future.set_result(functools.partial(self._release, lane))
+                continue
+            try:
+                task = self.pool.submit(fn, *args, **kwargs)
+            except Exception as e:
+                lane.running -= 1
+                self._running -= 1
+                self._pending -= 1
+                future.set_exception(e)
+                continue
+            # The worker is held until the render really finishes, even if the
+            # awaiting request is cancelled
+            task.add_done_callback(functools.partial(self._finished, lane, future))
+
+    def _release(self, lane: _Lane):
+        with self._lock:
+            lane.running -= 1
+            lane.completed += 1
+            self._running -= 1
+            self._pending -= 1
+            self.completed += 1
+            self._dispatch()
+
+    def _finished(self, lane: _Lane, future: Future, task):
+        self._release(lane)
+        if task.cancelled():
+            future.set_exception(CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    async def run(self, fn, *args, lane: str = DEFAULT_LANE, **kwargs):
+        """Run ``fn`` on the pool in ``lane`` and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, lane=lane, **kwargs))
+
+    async def run_timed(self, fn, *args, lane: str = DEFAULT_LANE):
+        """Like ``run``, adding the render's stages and its queue wait to the request timer.
+
+        Renders picked by the profiler also have their stacks sampled.
+        """
+        started = time.perf_counter()
+        timer = current_timer()
+        if profiler.enabled and profiler.should_sample():
+            from profiling import run_profiled
+            result, stages, stacks = await self.run(run_profiled, profiler.interval, fn, *args,
+                                                  lane=lane)
+            profiler.record(timer.name if timer is not None and timer.name else fn.__name__,
+                            stacks)
+        else:
+            result, stages = await self.run(run_timed, fn, *args, lane=lane)
+        if timer is not None:
+            timer.merge(stages)
+            timer.add("queue", max(0.0, time.perf_counter() - started - stages["render"]))
+        return result
+
+    async def iterate(self, iterator, lane: str = DEFAULT_LANE):
+        """Pull the items of a sync iterator on the render workers, in ``lane``.
+
+        In thread mode each item is one job, so a long stream shares the
+        workers with other renders instead of holding one throughout. Only
+        the first pull raises RenderQueueFull; later pulls wait for a free
+        slot, as the response is already under way. Iterators cannot leave
+        this process, so in process mode the stream instead reserves one
+        slot in its lane for its whole length and is pulled on the local
+        ``threads``.
+        """
+        if self.kind == "process":
+            stream = self._iterate_reserved(iterator, lane)
+            try:
+                async for item in stream:
+                    yield item
+            finally:
+                await stream.aclose()
+            return
+        started = False
+        try:
+            while True:
+                try:
+                    item = await self.run(next, iterator, _END, lane=lane)
+                except RenderQueueFull:
+                    if not started:
+                        raise
+                    await asyncio.sleep(0.05)
+                    continue
+                if item is _END:
+                    return
+                started = True
+                yield item
+        finally:
+            self._close(iterator)
+
+    async def _iterate_reserved(self, iterator, lane: str):
+        reservation = self.submit(None, lane=lane)
+        try:
+            release = await asyncio.wrap_future(reservation)
+        except asyncio.CancelledError:
+            reservation.add_done_callback(_release_unused)
+            self._close(iterator)
+            raise
+        pull = None
+        try:
+            while True:
+                pull = self.threads.submit(next, iterator, _END)
+                item = await asyncio.wrap_future(pull)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            self._close(iterator)
+            if pull is not None and not pull.done():
+                # Cancelled mid-pull: the slot is busy until the thread is done
+                pull.add_done_callback(lambda _: release())
+            else:
+                release()
+
+    @staticmethod
+    def _close(iterator):
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                pass    # still running on a worker after a cancel; it finishes alone
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executor": self.kind,
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "pending": self._pending,
+                "queued": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            threads, self._threads = self._threads, None
+            for lane in self.lanes.values():
+                while lane.queue:
+                    lane.queue.popleft()[0].cancel()
+                    self._pending -= 1
+        if pool is not None:
+            pool.shutdown(wait=wait)
+        if threads is not None:
+            threads.shutdown(wait=wait)
+
+
+render_executor = RenderExecutor()
@@ -0,0 +1,92 @@
+# stamps.py
+from PIL import Image, ImageDraw
+from functools import lru_cache
+import hashlib
+import re
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from fonts import load_font
+
+# ---- stamp presets: text -> RGB color ----
+STAMP_COLORS = {
+    "PAID": (5, 150, 105),
+    "OVERDUE": (220, 38, 38),
+    "VOID": (107, 114, 128),
+    "DRAFT": (37, 99, 235),
+}
+STAMP_ANGLE = 15
+PNG_STAMP_SIZE = 80
+PDF_STAMP_SIZE = 48
+_SAFE_NAME = re.compile(r"[A-Za-z0-9]+")
+
+
+def stamp_color(text: str, color=None):
+    """Return the explicit color, or the preset color for a stamp text."""
+    if color is not None:
+        return tuple(color)
+    return STAMP_COLORS.get(text, STAMP_COLORS["PAID"])
+
+
+@lru_cache(maxsize=32)
+def _png_stamp(text: str, color: tuple, angle: int, font_size: int):
+    font = load_font(font_size, bold=True)
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    _, _, x1, _ = probe.textbbox((20, 30), text, font=font)
+    # Box and canvas geometry match the original 300x150 PAID stamp at 80px
+    box_right = max(220, x1 + 10)
+    box_bottom = 25 + round(font_size * 95 / 80)
+    w = max(300, box_right + 15)
+    h = max(150, box_bottom + 30)
+
+    sprite = Image.new("RGBA", (w, h), (255, 255, 255, 0))
+    d = ImageDraw.Draw(sprite)
+    d.text((20, 30), text, font=font, fill=color)
+    d.rectangle((15, 25, box_right, box_bottom), outline=color, width=8)
+    return sprite.rotate(angle, expand=True)
+
+
+def get_png_stamp(text: str = "PAID", color=None, angle: int = STAMP_ANGLE,
+                  font_size: int = PNG_STAMP_SIZE):
+    """Return the cached, rotated RGBA stamp sprite. Do not modify it."""
+    return _png_stamp(text, stamp_color(text, color), angle, font_size)
+
+
+@lru_cache(maxsize=32)
+def _pdf_stamp_geometry(text: str, font_size: int):
+    text_w = stringWidth(text, "Helvetica-Bold", font_size)
+    box_w = max(140, text_w + 20)
+    box_h = font_size * 1.25
+    return box_w, box_h
+
+
+def draw_pdf_stamp(c, x, y, text: str = "PAID", color=None,
+                   angle: int = STAMP_ANGLE, font_size: int = PDF_STAMP_SIZE):
+    """Draw a stamp on a reportlab canvas at (x, y) in rotated coordinates.
+
+    The stamp is defined once per document as a Form XObject and reused
+    by every page that shows it.
+    """
+    rgb = stamp_color(text, color)
+    # Form names go unescaped into content streams, so free-form text is hashed
+    if _SAFE_NAME.fullmatch(text):
+        label = text
+    else:
+        label = "h" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    name = "stamp_%s_%02x%02x%02x_%d" % (label, rgb[0], rgb[1], rgb[2], font_size)
+    box_w, box_h = _pdf_stamp_geometry(text, font_size)
+
+    if not c.hasForm(name):
+        c.beginForm(name, lowerx=-15, lowery=-15, upperx=box_w, uppery=box_h)
+        c.setFillColorRGB(*(v / 255 for v in rgb))
+        c.setStrokeColorRGB(*(v / 255 for v in rgb))
+        c.setLineWidth(3)
+        c.setFont("Helvetica-Bold", font_size)
+        c.drawString(0, 0, text)
+        c.rect(-10, -10, box_w, box_h, stroke=1, fill=0)
+        c.endForm()
+
+    c.saveState()
+    c.rotate(angle)
+    c.translate(x, y)
+    c.doForm(name)
+    c.restoreState()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# The app is a set of top-level modules; make them importable from tests/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
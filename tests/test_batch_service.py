@@ -0,0 +1,24 @@
+# tests/test_batch_service.py
+"""A malformed NDJSON line fails only its own batch item."""
+import asyncio
+
+import pytest
+
+from services.batch_service import BadLine, parse_batch_body, render_item
+
+
+def test_bad_ndjson_line_is_reported_per_item():
+    body = b'{"invoice_no": "1"}\n{"invoice_no": \n\n{"invoice_no": "3"}\n'
+    items = parse_batch_body(body, "application/x-ndjson")
+    assert len(items) == 3
+    assert items[0] == {"invoice_no": "1"} and items[2] == {"invoice_no": "3"}
+    assert isinstance(items[1], BadLine)
+
+    entry = asyncio.run(render_item(1, items[1]))
+    assert entry["index"] == 1 and entry["status"] == "error"
+    assert "line 2 is not valid JSON" in entry["error"]
+
+
+def test_bad_json_array_fails_the_body():
+    with pytest.raises(ValueError):
+        parse_batch_body(b'[{"invoice_no": "1"},', "application/json")
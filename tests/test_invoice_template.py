@@ -0,0 +1,42 @@
+# tests/test_invoice_template.py
+"""Invoice PNGs and PDFs are both drawn from templates/invoice.json."""
+import pytest
+
+from imagegen import draw_invoice_pdf_bytes, draw_invoice_png_bytes
+from layout_capture import LayoutCapture
+from models import InvoiceRequest
+from services.invoice_service import process_invoice_data
+
+fitz = pytest.importorskip("fitz")
+
+INVOICE = {
+    "invoiceNo": "T-1",
+    "invoiceDate": "2025-12-02",
+    "dueDate": "2026-01-01",
+    "companyName": "Your Company Ltd.",
+    "companyAddress": "123 Business Street\nNew York, NY 10001",
+    "companyTaxId": "US123456789",
+    "clientName": "Client Company Inc.",
+    "clientAddress": "456 Client Avenue",
+    "clientEmail": "contact@client.com",
+    "currency": "EUR",
+    "lineItems": [{"description": f"Row {i}", "unitPrice": "1.00"} for i in range(120)],
+}
+
+
+def test_pdf_and_png_share_the_template_fields():
+    data = process_invoice_data(InvoiceRequest.model_validate(INVOICE))
+    layout = LayoutCapture()
+    draw_invoice_png_bytes(data, layout=layout)
+    png_fields = {entry["field"] for entry in layout.fields}
+
+    with fitz.open(stream=draw_invoice_pdf_bytes(data), filetype="pdf") as doc:
+        pages = [page.get_text() for page in doc]
+    assert len(pages) > 1
+    for field, text in (("company_tax_id", "Tax ID: US123456789"),
+                        ("client_email", "contact@client.com"),
+                        ("currency", "EUR")):
+        assert field in png_fields
+        assert text in pages[0]
+    # The template's table header is repeated on every page
+    assert all("Unit Price" in text for text in pages)
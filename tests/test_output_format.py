@@ -0,0 +1,20 @@
+# tests/test_output_format.py
+"""Requested formats map to the four rendered ones before labels and cache keys."""
+import pytest
+
+from models import InvoiceRequest, ReceiptRequest
+
+INVOICE = {"invoiceNo": "F-1", "invoiceDate": "2025-12-02", "dueDate": "2026-01-01",
+           "companyName": "Co", "companyAddress": "Street", "clientName": "Client",
+           "clientAddress": "Avenue", "currency": "USD", "itemDescription": "Work",
+           "unitPrice": "10"}
+RECEIPT = {"receiptNo": "R-1", "receiptDate": "2025-12-02", "companyName": "Co",
+           "receivedFrom": "Client", "currency": "USD", "totalSum": "10"}
+
+
+@pytest.mark.parametrize("requested, rendered", [
+    ("PNG", "png"), ("Pdf", "pdf"), ("WEBP", "webp"), ("jpeg", "jpeg"), ("gif", "png"), ("", "png"),
+])
+def test_format_is_canonical(requested, rendered):
+    assert InvoiceRequest.model_validate(dict(INVOICE, format=requested)).format == rendered
+    assert ReceiptRequest.model_validate(dict(RECEIPT, format=requested)).format == rendered
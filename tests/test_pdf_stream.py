@@ -0,0 +1,35 @@
+# tests/test_pdf_stream.py
+"""Streaming a large invoice PDF must keep memory bounded by one page."""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+ROWS = 10_000
+# The streaming writer grows peak RSS by well under 1 MB on 10,000 rows;
+# the in-memory writer by about 6 MB, and in proportion to the rows
+MAX_STREAM_RSS_MB = 2.0
+
+pytestmark = pytest.mark.skipif(not Path("/proc/self/clear_refs").exists(),
+                                reason="peak RSS can only be reset on Linux")
+
+
+def _measure(mode: str) -> dict:
+    """Render in a fresh process, so its peak RSS is the writer's alone."""
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_pdf_stream", "--child",
+                          mode, str(ROWS)], cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def test_streaming_peak_rss_is_bounded():
+    stream = _measure("stream")
+    assert stream["bytes"] > 0
+    assert stream["rss_growth_mb"] <= MAX_STREAM_RSS_MB
+
+
+def test_in_memory_writer_exceeds_the_limit():
+    # Proves the measurement can see a writer that buffers the document
+    assert _measure("memory")["rss_growth_mb"] > MAX_STREAM_RSS_MB
@@ -0,0 +1,50 @@
+# tests/test_pdf_stream_parity.py
+"""A streamed invoice PDF must match the one reportlab writes in memory."""
+import pytest
+
+from imagegen import draw_invoice_pdf_bytes, iter_invoice_pdf_chunks
+from models import InvoiceRequest
+from services.invoice_service import process_invoice_data
+
+fitz = pytest.importorskip("fitz")
+
+# Both writers emit the same operators with reportlab's number formatting,
+# so rasterized pages are expected to match exactly: the largest allowed
+# difference of any pixel channel (0-255) at RASTER_DPI is
+MAX_CHANNEL_DIFF = 0
+RASTER_DPI = 100
+
+INVOICE = {
+    "invoiceNo": "P-120",
+    "invoiceDate": "2025-12-02",
+    "dueDate": "2026-01-01",
+    "companyName": "Łódź Software Sp. z o.o.",
+    "companyAddress": "ul. Piotrkowska 1\n90-001 Łódź",
+    "clientName": "Zürich Client AG",
+    "clientAddress": "Bahnhofstrasse 1\n8001 Zürich",
+    "currency": "EUR",
+    "discount": "5",
+    "taxRate": "23",
+    "notes": "Dziękujemy! € αβγ 日本",
+    "stamp": "PAID",
+    "lineItems": [{"description": f"Row {i} usługa € αβγ" + ("\nsecond line" if i % 4 == 0 else ""),
+                   "quantity": i % 3 + 1, "unitPrice": 1.5 * i} for i in range(120)],
+}
+
+
+def test_streamed_pdf_matches_in_memory_pdf():
+    data = process_invoice_data(InvoiceRequest.model_validate(INVOICE))
+    memory = fitz.open(stream=draw_invoice_pdf_bytes(data), filetype="pdf")
+    streamed = fitz.open(stream=b"".join(iter_invoice_pdf_chunks(data)), filetype="pdf")
+    with memory, streamed:
+        assert streamed.page_count == memory.page_count > 1
+        for expected, page in zip(memory, streamed):
+            assert page.get_text() == expected.get_text()
+            a = expected.get_pixmap(dpi=RASTER_DPI).samples
+            b = page.get_pixmap(dpi=RASTER_DPI).samples
+            assert len(a) == len(b)
+            assert max((abs(x - y) for x, y in zip(a, b) if x != y), default=0) <= MAX_CHANNEL_DIFF
+        # Text outside cp1252 takes reportlab's fallbacks (Greek from the
+        # Symbol font, a box for the rest) instead of turning into "?"
+        text = streamed[0].get_text()
+        assert "€ αβγ" in text and "?" not in text
@@ -0,0 +1,91 @@
+# tests/test_png_base_layer.py
+"""The cached base layer must not change a single pixel of an invoice PNG."""
+import hashlib
+import io
+
+import pytest
+from PIL import Image, ImageFont
+
+import fonts
+import imagegen
+import layout_spec
+import stamps
+from services.invoice_service import process_invoice_data
+
+INVOICE = {
+    "invoice_no": "2025-55577",
+    "invoice_date": "2025-12-02",
+    "due_date": "2026-01-01",
+    "payment_terms": "Net 30",
+    "company_name": "Your Company Ltd.",
+    "company_address": "123 Business Street\nNew York, NY 10001\nUnited States",
+    "company_tax_id": "US123456789",
+    "company_email": "billing@yourcompany.com",
+    "company_phone": "+1 (555) 123-4567",
+    "client_name": "Client Company Inc.",
+    "client_address": "456 Client Avenue\nLos Angeles, CA 90001\nUnited States",
+    "client_email": "contact@client.com",
+    "client_phone": "+1 (555) 987-6543",
+    "currency": "USD",
+    "payment_method": "Bank Transfer",
+    "item_description": "Professional consulting services\nProject management and delivery",
+    "quantity": "1",
+    "unit_price": "5000.00",
+    "tax_rate": "8.5",
+    "discount": "10",
+    "notes": "Thank you for your business!\nPayment is due within 30 days.",
+}
+
+CASES = {
+    "paid": {"mark_paid": "yes"},
+    "unpaid": {},
+    "free_form_stamp": {"stamp": "SEE ATTACHED"},
+}
+
+# sha256 of the decoded RGB pixels, drawn with Pillow's bundled font (see
+# BundledFontRegistry) so they do not depend on the fonts installed.
+# Regenerate only for an intended change to the invoice PNG.
+GOLDEN = {
+    "paid": "4b89a1861f8f0e32ed2228e666f5438f7ef41148a94d2eb57bf06eda70874506",
+    "unpaid": "75f6abd2f761b04c5247323e8103cdb1a58a83e906e30139aa45f78677f00de1",
+    "free_form_stamp": "45d4584b001869e0c0e391aaf18399e94ca693d2c7e859ac6d4b449a903b3848",
+}
+
+
+class BundledFontRegistry(fonts.FontRegistry):
+    """Pillow's bundled scalable font at every size, whatever is installed"""
+
+    def _open(self, family: str, weight: str, size: int):
+        return ImageFont.load_default(size)
+
+
+@pytest.fixture(autouse=True)
+def bundled_font(monkeypatch):
+    """Render with the bundled font and with empty sprite, plan and layer caches."""
+    monkeypatch.setattr(fonts, "registry", BundledFontRegistry(paths=()))
+    # Compiled plans hold their fonts (and base layers)
+    monkeypatch.setattr(layout_spec, "_plans", {})
+    stamps._png_stamp.cache_clear()
+    yield
+    stamps._png_stamp.cache_clear()
+
+
+def _pixels(case: str, use_base_layer: bool) -> bytes:
+    data = process_invoice_data(dict(INVOICE, **CASES[case]))
+    png = imagegen.draw_invoice_png_bytes(data, use_base_layer=use_base_layer)
+    with Image.open(io.BytesIO(png)) as im:
+        return im.convert("RGB").tobytes()
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_base_layer_is_pixel_identical(case):
+    # Twice with the layer: the second render copies the cached layer
+    cached = [_pixels(case, True), _pixels(case, True)]
+    drawn = _pixels(case, False)
+    assert cached[0] == drawn
+    assert cached[1] == drawn
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_matches_golden_image(case):
+    assert hashlib.sha256(_pixels(case, True)).hexdigest() == GOLDEN[case]
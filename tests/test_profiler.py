@@ -0,0 +1,33 @@
+# tests/test_profiler.py
+"""Disabled profiling must cost nothing; enabled, it must sample the renderer."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+REQUESTS = 5
+
+
+def _measure(sample_rate: int) -> dict:
+    """Post uncached renders in a fresh process with PROFILE_SAMPLE_RATE set."""
+    env = dict(os.environ, PROFILE_SAMPLE_RATE=str(sample_rate))
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_profiler", "--child",
+                          str(REQUESTS)], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def test_disabled_profiling_is_free():
+    result = _measure(0)
+    assert not result["sampler_imported"]
+    assert result["profiles"] == 0
+    assert result["profile_status"] == 404
+
+
+def test_enabled_profiling_samples_the_renderer():
+    result = _measure(1)
+    assert result["sampler_imported"]
+    assert result["profiles"] == REQUESTS
+    assert result["renderer_sampled"]
@@ -0,0 +1,20 @@
+# tests/test_receipt_pdf.py
+"""Receipt PDFs are drawn from the layout template on an A4 portrait page."""
+import pytest
+from reportlab.lib.pagesizes import A4
+
+from receipt_pdf import draw_receipt_pdf_bytes
+
+fitz = pytest.importorskip("fitz")
+
+
+def test_receipt_pdf_is_a4_portrait():
+    pdf = draw_receipt_pdf_bytes("Your Company Ltd.", "R-2025-001", "Client Inc.",
+                                 "2025-12-02", "USD", "150.00", "Consulting")
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        assert doc.page_count == 1
+        page = doc[0]
+        assert page.rect.width == pytest.approx(A4[0], abs=0.01)
+        assert page.rect.height == pytest.approx(A4[1], abs=0.01)
+        text = page.get_text()
+    assert "R-2025-001" in text and "Total Received 150.00 USD" in text
@@ -0,0 +1,49 @@
+# tests/test_render_cache.py
+"""The render cache's disk tier stays under its byte cap, evicting least recently used."""
+import threading
+
+from services.render_cache import RenderCache
+
+
+def _disk_keys(directory) -> set:
+    return {path.name for path in directory.glob("*/*")}
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=300)
+    for key in ("aa1", "bb2", "cc3"):
+        cache.put(key, b"x" * 100)
+    cache.flush()
+    assert _disk_keys(tmp_path) == {"aa1", "bb2", "cc3"}
+
+    # A disk hit makes aa1 the most recently used
+    assert cache.get("aa1") == b"x" * 100
+    cache.put("dd4", b"y" * 100)
+    cache.flush()
+    assert _disk_keys(tmp_path) == {"aa1", "cc3", "dd4"}
+    assert cache.stats()["disk_bytes"] == 300
+
+
+def test_disk_index_survives_restarts(tmp_path):
+    first = RenderCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=250)
+    first.put("aa1", b"x" * 100)
+    first.put("bb2", b"x" * 100)
+    first.flush()
+
+    second = RenderCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=250)
+    assert second.get("bb2") == b"x" * 100
+    second.put("cc3", b"x" * 100)
+    second.flush()
+    assert _disk_keys(tmp_path) == {"bb2", "cc3"}
+
+
+def test_put_does_not_write_on_the_calling_thread(tmp_path, monkeypatch):
+    cache = RenderCache(directory=str(tmp_path))
+    writers = []
+    write = cache._write
+    monkeypatch.setattr(cache, "_write", lambda *args: (
+        writers.append(threading.current_thread()), write(*args)))
+    cache.put("aa1", b"x")
+    cache.flush()
+    assert writers and writers[0] is not threading.current_thread()
+    assert cache.get("aa1") == b"x"
@@ -0,0 +1,32 @@
+# tests/test_stamps.py
+"""Free-form stamps must produce valid PDFs with the stamp drawn."""
+import pytest
+
+from imagegen import draw_invoice_pdf_bytes
+from services.invoice_service import process_invoice_data
+
+fitz = pytest.importorskip("fitz")
+
+INVOICE = {
+    "invoice_no": "S-1",
+    "invoice_date": "2025-01-01",
+    "due_date": "2025-01-31",
+    "company_name": "Acme",
+    "company_address": "1 Street",
+    "client_name": "Bob",
+    "client_address": "2 Avenue",
+    "currency": "EUR",
+    "item_description": "Work",
+    "unit_price": "10",
+}
+
+
+@pytest.mark.parametrize("stamp", ["PAID", "SEE ATTACHED (x)", "a/b #1 <ok>"])
+def test_pdf_stamp_is_drawn(stamp):
+    pdf = draw_invoice_pdf_bytes(process_invoice_data(dict(INVOICE, stamp=stamp)))
+    fitz.TOOLS.mupdf_warnings()     # clear earlier warnings
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        text = doc[0].get_text()
+    assert fitz.TOOLS.mupdf_warnings() == ""
+    # Long stamps run off the page edge; their start must be drawn
+    assert stamp.split()[0] in text.split()
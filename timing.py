@@ -0,0 +1,117 @@
+# timing.py
+"""Per-request stage timers shared by the routes, services and renderers.
+
+A request's StageTimer is found through a context variable, so code deep
+in a renderer can time a stage with ``with stage("encode"):`` without the
+timer being passed down. With no active timer (scripts, the corpus
+generator, warm-up) ``stage`` does nothing.
+
+Renders run on the render executor, possibly in another process, so
+they are wrapped in ``run_timed``, which times the call under a fresh
+timer and returns the stage durations with the result for the caller to
+merge.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+_current: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """Accumulates the seconds spent in each named stage of one request."""
+
+    def __init__(self, name: str = ""):
+        self.name = name    # what is being timed, e.g. "POST /api/generate"
+        self.started = self._last = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.labels: Optional[Dict[str, str]] = None   # set by routes that render
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark(self, name: str):
+        """Add the time since the previous mark (or the start) to stage ``name``."""
+        now = time.perf_counter()
+        self.add(name, now - self._last)
+        self._last = now
+
+    def merge(self, stages: Dict[str, float]):
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """The stages as a Server-Timing header value, in milliseconds."""
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items())
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current.get()
+
+
+def set_timer(timer: Optional[StageTimer]):
+    """Make ``timer`` current; returns a token for ``reset_timer``."""
+    return _current.set(timer)
+
+
+def reset_timer(token):
+    _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Add the time spent in the block to stage ``name`` of the current timer."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as stage ``name``."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            timer = _current.get()
+            if timer is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.add(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# Stages the renderers time themselves; the rest of a render is drawing
+RENDER_STAGES = ("fonts", "encode")
+
+
+def run_timed(fn, *args, **kwargs):
+    """Call ``fn`` under a fresh timer; returns ``(result, stages)``.
+
+    The whole call is the ``render`` stage, and the part of it not spent
+    in font loading or encoding is reported as ``draw``. ``fn`` and its
+    arguments must be picklable for process executors.
+    """
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _current.reset(token)
+    render = timer.elapsed()
+    timer.add("draw", max(0.0, render - sum(timer.stages.get(s, 0.0) for s in RENDER_STAGES)))
+    timer.add("render", render)
+    return result, timer.stages